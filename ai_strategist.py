@@ -0,0 +1,43 @@
+from pydantic import BaseModel, Field
+from typing import List, Literal
+import llm_cache
+
+# Structured-output models and prompts for the AI Strategist (used by app.py and the benchmarks)
+
+ANALYSIS_MODEL = "gemini-2.5-flash"
+DRAFT_MODEL = "gemini-2.5-flash"
+ANALYSIS_SYSTEM_PROMPT = "You are a ruthless D2C Growth Consultant. Analyze Shopify and Meta Ads data. Only recommend from these 4 actions: kill_ad, scale_ad, draft_email, launch_promo."
+
+# --- AI INSTRUCTION MODELS ---
+class AdCreativeDraft(BaseModel):
+    headline: str = Field(description="The short, punchy headline.")
+    primary_text: str = Field(description="The main body text of the ad.")
+    call_to_action: Literal["SHOP_NOW", "LEARN_MORE", "GET_OFFER", "SIGN_UP"] = Field(description="The CTA button text.")
+    image_prompt: str = Field(description="Describe the exact image.")
+
+class EmailDraft(BaseModel):
+    subject_line: str = Field(description="A high-converting email subject line.")
+    body_text: str = Field(description="The full text body of the email.")
+
+class RecommendedAction(BaseModel):
+    action_type: Literal["kill_ad", "scale_ad", "draft_email", "launch_promo"] = Field(description="The specific type of action.")
+    confidence_score: int = Field(description="Confidence score from 1-100.")
+    rationale: str = Field(description="One sentence explaining WHY.")
+    target_entity: str = Field(description="The ID or name of the ad/product.")
+
+class InsightResponse(BaseModel):
+    summary: str = Field(description="A 2-sentence summary of performance.")
+    primary_bottleneck: str = Field(description="Identify the biggest point of friction.")
+    recommendations: List[RecommendedAction] = Field(description="List of specific actions.")
+
+# --- AI GENERATION FUNCTIONS ---
+# Responses are cached on disk across sessions and restarts (see llm_cache.py)
+def generate_ad_draft(action_type, target_entity, rationale):
+    system_prompt = "You are an elite D2C performance marketer writing Facebook ads."
+    user_prompt = f"Action: {action_type}\nTargeting: {target_entity}\nContext: {rationale}\nWrite exact ad copy."
+    return llm_cache.generate_json(DRAFT_MODEL, system_prompt, user_prompt, AdCreativeDraft, 0.7)
+
+def generate_email_draft(target_entity, rationale):
+    system_prompt = "You are an elite D2C email marketer. Write high-converting retention emails."
+    user_prompt = f"Targeting: {target_entity}\nContext: {rationale}\nWrite exact email copy."
+    return llm_cache.generate_json(DRAFT_MODEL, system_prompt, user_prompt, EmailDraft, 0.7)
@@ -0,0 +1,116 @@
+import json
+import numpy as np
+import pandas as pd
+
+# Vectorized performance metrics for the AI Strategist.
+#
+# Works on the dashboard's daily frame (date, amount, orders, spend, ...) and raw per-ad rows
+# (ad_id, date, spend, clicks, impressions, purchases). Ads are pivoted into date x ad matrices
+# so rolling windows and z-scores for every ad are computed in one pass, and the result is
+# squeezed into a compact JSON summary for the prompt.
+#
+# Orders aren't attributed to ads, so per-ad revenue is estimated as purchases x that day's
+# average order value. Without any purchase data, per-ad ROAS/CPA are NaN (unknown).
+
+WINDOWS = (7, 28)
+Z_THRESHOLD = 2.5
+MAX_ADS_IN_PROMPT = 15
+
+
+def _safe_div(a, b):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (a / b).replace([np.inf, -np.inf], np.nan)
+
+
+def _zscore(wide, window=28):
+    """How unusual each value is versus the trailing window before it (NaN after a flat window)."""
+    history = wide.shift(1).rolling(window, min_periods=7)
+    return _safe_div(wide - history.mean(), history.std())
+
+
+def daily_metrics(daily_df):
+    """Per-day ROAS, CPA, CTR, CPM plus 7/28-day rolling sums and z-scores."""
+    df = daily_df.set_index("date").sort_index().asfreq("D", fill_value=0)
+    for column in ("clicks", "impressions"):
+        if column not in df:
+            df[column] = 0
+
+    out = pd.DataFrame(index=df.index)
+    out["sales"], out["spend"], out["orders"] = df["amount"], df["spend"], df["orders"]
+    out["roas"] = _safe_div(df["amount"], df["spend"])
+    out["cpa"] = _safe_div(df["spend"], df["orders"])
+    out["ctr"] = _safe_div(df["clicks"], df["impressions"])
+    out["cpm"] = _safe_div(df["spend"], df["impressions"]) * 1000
+    for w in WINDOWS:
+        rolled = df[["amount", "spend", "orders"]].rolling(w, min_periods=1).sum()
+        out[f"roas_{w}d"] = _safe_div(rolled["amount"], rolled["spend"])
+        out[f"cpa_{w}d"] = _safe_div(rolled["spend"], rolled["orders"])
+    z = _zscore(out[["sales", "spend", "roas"]])
+    out[["z_sales", "z_spend", "z_roas"]] = z.to_numpy()
+    return out
+
+
+def ad_metrics(ads_df, daily_df):
+    """
+    Per-ad rolling metrics as of the last day. Returns one row per ad_id with
+    spend/ROAS/CPA/CTR/CPM over 7 and 28 days, the ROAS trend and the latest ROAS z-score.
+    """
+    if ads_df.empty:
+        return pd.DataFrame()
+    ads = ads_df.assign(date=pd.to_datetime(ads_df["date"]))
+    # No purchase attribution at all (pixel not set up, old rows) is unknown, not zero ROAS
+    attributed = "purchases" in ads and ads["purchases"].fillna(0).sum() > 0
+
+    dates = pd.date_range(ads["date"].min(), ads["date"].max(), freq="D")
+    wide = {col: ads.pivot_table(index="date", columns="ad_id", values=col, aggfunc="sum").reindex(dates).fillna(0)
+            for col in ("spend", "clicks", "impressions")}
+    wide["purchases"] = (ads.pivot_table(index="date", columns="ad_id", values="purchases", aggfunc="sum").reindex(dates).fillna(0)
+                         if attributed else wide["spend"] * np.nan)
+
+    daily = daily_df.set_index(pd.to_datetime(daily_df["date"]))
+    aov = _safe_div(daily["amount"], daily["orders"]).reindex(dates).ffill().fillna(0)
+    wide["revenue"] = wide["purchases"].mul(aov, axis=0)
+
+    result = {}
+    for w in WINDOWS:
+        last = {col: frame.rolling(w, min_periods=1).sum().iloc[-1] for col, frame in wide.items()}
+        result[f"spend_{w}d"] = last["spend"]
+        result[f"roas_{w}d"] = _safe_div(last["revenue"], last["spend"])
+        result[f"cpa_{w}d"] = _safe_div(last["spend"], last["purchases"])
+        result[f"ctr_{w}d"] = _safe_div(last["clicks"], last["impressions"])
+        result[f"cpm_{w}d"] = _safe_div(last["spend"], last["impressions"]) * 1000
+    out = pd.DataFrame(result)
+    out["roas_trend"] = _safe_div(out["roas_7d"], out["roas_28d"])
+    out["z_roas"] = _zscore(_safe_div(wide["revenue"], wide["spend"])).iloc[-1]
+    out.index.name = "ad_id"
+    return out.sort_values("spend_7d", ascending=False)
+
+
+def _round(value, digits=2):
+    return None if value is None or pd.isna(value) else round(float(value), digits)
+
+
+def prompt_summary(daily_df, ads_df, days=7):
+    """Compact JSON (no whitespace, rounded, top ads only) describing the store for Gemini."""
+    if daily_df.empty:
+        return json.dumps({"last_7d": None, "days": [], "anomalies": [], "ads": [], "note": "no data synced yet"},
+                          separators=(",", ":"))
+    day = daily_metrics(daily_df)
+    ads = ad_metrics(ads_df, daily_df)
+    last = day.iloc[-1]
+
+    summary = {
+        "last_7d": {"sales": _round(day["sales"].tail(7).sum(), 0), "spend": _round(day["spend"].tail(7).sum(), 0),
+                    "roas": _round(last["roas_7d"]), "roas_28d": _round(last["roas_28d"]), "cpa": _round(last["cpa_7d"])},
+        "days": [[d.strftime("%m-%d"), _round(r.sales, 0), _round(r.spend, 0), _round(r.roas)]
+                 for d, r in day.tail(days).iterrows()],
+        "day_columns": ["date", "sales", "spend", "roas"],
+        "anomalies": [{"date": d.strftime("%Y-%m-%d"), "metric": m[2:], "z": _round(r[m], 1)}
+                      for d, r in day.tail(days).iterrows() for m in ("z_sales", "z_spend", "z_roas")
+                      if pd.notna(r[m]) and abs(r[m]) >= Z_THRESHOLD],
+        "ads": [{"ad_id": ad_id, "spend_7d": _round(r.spend_7d, 0), "roas_7d": _round(r.roas_7d),
+                 "roas_28d": _round(r.roas_28d), "cpa_7d": _round(r.cpa_7d), "ctr_7d": _round(r.ctr_7d, 4),
+                 "cpm_7d": _round(r.cpm_7d), "trend": _round(r.roas_trend), "z_roas": _round(r.z_roas, 1)}
+                for ad_id, r in ads.head(MAX_ADS_IN_PROMPT).iterrows()],
+    }
+    return json.dumps(summary, separators=(",", ":"))
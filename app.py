@@ -1,17 +1,18 @@
-import streamlit as st
-import pandas as pd
-import os
 import time
-import requests
-import json
-from supabase import create_client
-from dotenv import load_dotenv
+RUN_STARTED = time.perf_counter()
+
+import streamlit as st
 import auth
 
-# --- GOOGLE GEMINI IMPORTS ---
-import google.generativeai as genai
-from pydantic import BaseModel, Field
-from typing import List, Literal
+# Startup budgets per script run (ms); overruns are logged so regressions are visible
+LOGIN_BUDGET_MS = 100
+DASHBOARD_BUDGET_MS = 1500
+
+def check_startup_budget(page, budget_ms):
+    elapsed_ms = (time.perf_counter() - RUN_STARTED) * 1000
+    st.session_state[f"{page}_startup_ms"] = elapsed_ms
+    if elapsed_ms > budget_ms:
+        print(f"⚠️ {page} page took {elapsed_ms:.0f}ms (budget {budget_ms}ms)")
 
 # 1. Page Config
 st.set_page_config(page_title="GrowifyX Dashboard", layout="wide")
@@ -22,132 +23,171 @@ if "logged_in" not in st.session_state:
 
 if not st.session_state["logged_in"]:
     auth.login_form()
+    check_startup_budget("login", LOGIN_BUDGET_MS)
     st.stop()
 
-# Load Secrets
-load_dotenv("secrets.txt")
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SERVICE_ROLE_KEY")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Dashboard-only imports: the login page above never pays for these.
+# Gemini and Meta SDK code is imported on first use inside llm_cache / meta_deploy.
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import clients
+import queries
+import local_cache
+import llm_cache
+import partial_json
+import metrics
+import analytics
+import rules
+import charts
+from ai_strategist import (AdCreativeDraft, EmailDraft, InsightResponse, ANALYSIS_MODEL, ANALYSIS_SYSTEM_PROMPT,
+                           generate_ad_draft, generate_email_draft)
+
+config = clients.load_config()
+supabase = clients.get_supabase()
+
+run_spans = metrics.begin_run()
+metrics_server = metrics.serve(config["METRICS_PORT"])
 
 # Meta API Keys (Leave blank for Demo Mode)
-META_TOKEN = os.getenv("META_ACCESS_TOKEN", "")
-META_AD_ACCOUNT = os.getenv("META_AD_ACCOUNT_ID", "")
-META_PAGE = os.getenv("META_PAGE_ID", "")
-
-# Initialize Google Gemini
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+META_TOKEN = config["META_TOKEN"]
+META_AD_ACCOUNT = config["META_AD_ACCOUNT"]
+META_PAGE = config["META_PAGE"]
 
 # --- META API FUNCTIONS ---
-META_GRAPH_URL = "https://graph.facebook.com/v18.0"
-
+# Deploys run in the background (see meta_deploy.py); the page polls the job until it finishes.
 def deploy_to_meta(headline, primary_text, cta, image_url):
-    """Orchestrates the 4-step Meta API sequence."""
-    if not META_TOKEN or not META_AD_ACCOUNT:
-        # DEMO MODE: Simulate the API call for Loom videos
-        time.sleep(1.5)
-        st.toast("Uploading Image to Meta...")
-        time.sleep(1)
-        st.toast("Creating Paused Campaign...")
-        time.sleep(1)
-        st.toast("Assembling Ad Creative...")
-        time.sleep(1.5)
-        return "DEMO_SUCCESS"
-
-    # REAL MODE: Actual Meta API Calls
-    try:
-        # Step 1: Upload Image
-        img_bytes = requests.get(image_url).content
-        res1 = requests.post(f"{META_GRAPH_URL}/{META_AD_ACCOUNT}/adimages", files={"filename": ("ad.jpg", img_bytes, "image/jpeg")}, data={"access_token": META_TOKEN})
-        image_hash = res1.json()["images"][next(iter(res1.json()["images"]))]["hash"]
-
-        # Step 2: Create Campaign
-        res2 = requests.post(f"{META_GRAPH_URL}/{META_AD_ACCOUNT}/campaigns", data={"access_token": META_TOKEN, "name": "GrowifyX AI Promo", "objective": "OUTCOME_SALES", "status": "PAUSED", "special_ad_categories": "[]"})
-        camp_id = res2.json()["id"]
-
-        # Step 3: Create Ad Set
-        targeting = {"geo_locations": {"countries": ["IN", "US"]}, "age_min": 18, "age_max": 65}
-        res3 = requests.post(f"{META_GRAPH_URL}/{META_AD_ACCOUNT}/adsets", data={"access_token": META_TOKEN, "name": "AI Broad Audience", "campaign_id": camp_id, "daily_budget": "100000", "billing_event": "IMPRESSIONS", "optimization_goal": "REACH", "targeting": json.dumps(targeting), "status": "PAUSED"})
-        adset_id = res3.json()["id"]
-
-        # Step 4: Create Ad
-        story_spec = {"page_id": META_PAGE, "link_data": {"image_hash": image_hash, "link": "https://your-d2c-brand.com", "message": primary_text, "name": headline, "call_to_action": {"type": cta}}}
-        res4 = requests.post(f"{META_GRAPH_URL}/{META_AD_ACCOUNT}/adcreatives", data={"access_token": META_TOKEN, "name": f"Creative - {headline[:20]}", "object_story_spec": json.dumps(story_spec), "status": "ACTIVE"})
-        creative_id = res4.json()["id"]
-        
-        res5 = requests.post(f"{META_GRAPH_URL}/{META_AD_ACCOUNT}/ads", data={"access_token": META_TOKEN, "name": "GrowifyX AI Drafted Ad", "adset_id": adset_id, "creative": json.dumps({"creative_id": creative_id}), "status": "PAUSED"})
-        return res5.json()["id"]
-    except Exception as e:
-        return f"ERROR: {str(e)}"
-
-# --- AI INSTRUCTION MODELS ---
-class AdCreativeDraft(BaseModel):
-    headline: str = Field(description="The short, punchy headline.")
-    primary_text: str = Field(description="The main body text of the ad.")
-    call_to_action: Literal["SHOP_NOW", "LEARN_MORE", "GET_OFFER", "SIGN_UP"] = Field(description="The CTA button text.")
-    image_prompt: str = Field(description="Describe the exact image.")
-
-class EmailDraft(BaseModel):
-    subject_line: str = Field(description="A high-converting email subject line.")
-    body_text: str = Field(description="The full text body of the email.")
-
-class RecommendedAction(BaseModel):
-    action_type: Literal["kill_ad", "scale_ad", "draft_email", "launch_promo"] = Field(description="The specific type of action.")
-    confidence_score: int = Field(description="Confidence score from 1-100.")
-    rationale: str = Field(description="One sentence explaining WHY.")
-    target_entity: str = Field(description="The ID or name of the ad/product.")
-
-class InsightResponse(BaseModel):
-    summary: str = Field(description="A 2-sentence summary of performance.")
-    primary_bottleneck: str = Field(description="Identify the biggest point of friction.")
-    recommendations: List[RecommendedAction] = Field(description="List of specific actions.")
-
-# --- AI GENERATION FUNCTIONS ---
-@st.cache_data(show_spinner=False)
-def generate_ad_draft(action_type, target_entity, rationale):
-    system_prompt = "You are an elite D2C performance marketer writing Facebook ads."
-    user_prompt = f"Action: {action_type}\nTargeting: {target_entity}\nContext: {rationale}\nWrite exact ad copy."
-    model = genai.GenerativeModel('gemini-2.5-flash', system_instruction=system_prompt)
-    res = model.generate_content(user_prompt, generation_config=genai.GenerationConfig(response_mime_type="application/json", response_schema=AdCreativeDraft, temperature=0.7))
-    return res.text
-
-@st.cache_data(show_spinner=False)
-def generate_email_draft(target_entity, rationale):
-    system_prompt = "You are an elite D2C email marketer. Write high-converting retention emails."
-    user_prompt = f"Targeting: {target_entity}\nContext: {rationale}\nWrite exact email copy."
-    model = genai.GenerativeModel('gemini-2.5-flash', system_instruction=system_prompt)
-    res = model.generate_content(user_prompt, generation_config=genai.GenerationConfig(response_mime_type="application/json", response_schema=EmailDraft, temperature=0.7))
-    return res.text
+    """Starts the Meta deploy job and returns its id. Demo Mode when Meta keys are blank."""
+    import meta_deploy
+    deployer = meta_deploy.get_deployer(META_TOKEN, META_AD_ACCOUNT, META_PAGE) if META_TOKEN and META_AD_ACCOUNT else None
+    return meta_deploy.submit(deployer, headline, primary_text, cta, image_url)
+
+def render_deploy_status(job_key, success_message):
+    """Shows the status of the deploy job stored under `job_key`; returns True while it is still running."""
+    if job_key not in st.session_state:
+        return False
+    import meta_deploy
+    job = meta_deploy.job_status(st.session_state[job_key])
+    if job["status"] == "running":
+        st.info(f"⏳ {job['step']}")
+        return True
+    if job["status"] == "error":
+        st.error(job["result"])
+    else:
+        st.success(success_message)
+        st.caption(" · ".join(f"{step}: {secs:.2f}s" for step, secs in job["timings"].items()))
+        if not st.session_state.get(f"{job_key}_celebrated"):
+            st.session_state[f"{job_key}_celebrated"] = True
+            st.balloons()
+    return False
+
+# --- DRAFT PREFETCH ---
+# As soon as an analysis lands, every recommendation's draft is written concurrently in the
+# background; each card shows the draft when ready instead of blocking the whole page.
+@st.cache_resource
+def draft_pool():
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="drafts")
+
+def draft_request(rec):
+    """Returns (generator, args, schema) for the draft a recommendation needs, or None."""
+    if rec.action_type == "kill_ad":
+        return generate_ad_draft, ("launch_replacement", rec.target_entity, "Write a fresh ad."), AdCreativeDraft
+    if rec.action_type == "launch_promo":
+        return generate_ad_draft, (rec.action_type, rec.target_entity, rec.rationale), AdCreativeDraft
+    if rec.action_type == "draft_email":
+        return generate_email_draft, (rec.target_entity, rec.rationale), EmailDraft
+    return None
+
+def prefetch_drafts(insights):
+    """Starts drafts for recommendations that don't have one yet (enriched rule cards keep theirs)."""
+    futures = st.session_state.setdefault("draft_futures", {})
+    for i, rec in enumerate(insights.recommendations):
+        request = draft_request(rec)
+        if request and i not in futures:
+            fn, args, _ = request
+            futures[i] = draft_pool().submit(fn, *args)
+
+def get_draft(i, rec):
+    """The parsed draft for recommendation `i`; None while it is still being written, False if it failed."""
+    fn, args, schema = draft_request(rec)
+    futures = st.session_state.setdefault("draft_futures", {})
+    if i not in futures:
+        futures[i] = draft_pool().submit(fn, *args)
+    if not futures[i].done():
+        return None
+    if futures[i].exception():
+        st.error(f"AI Error: {futures.pop(i).exception()}")  # Retried on the next rerun
+        return False
+    return schema.model_validate_json(futures[i].result())
 
 # Sidebar
 with st.sidebar:
     st.write(f"Connected: **{st.session_state['shop_url']}**")
     if st.button("Logout"):
         auth.logout()
+    st.caption(f"AI cache: {llm_cache.stats['hits']} hits / {llm_cache.stats['misses']} misses")
+    rules_only = st.toggle("⚡ Rules-only analysis", value=config["RULES_ONLY"],
+                           help="Skip Gemini: recommendations come from the built-in rules in well under a second.")
+    latency_panel = st.empty()  # Filled at the end of the run for admin shops
 
 st.title("🚀 GrowifyX: Command Center")
 
-# Fetch Data
-@st.cache_data
+# Fetch Data (one pre-aggregated row per day from the daily_metrics rollup).
+# local_cache keeps a per-shop Parquet copy on disk and only pulls rows changed since last time.
+@st.cache_data(ttl=300)
 def get_data(shop_url):
-    orders = supabase.table("shopify_orders").select("*").execute()
-    ads = supabase.table("facebook_ads").select("*").execute()
-    return pd.DataFrame(orders.data), pd.DataFrame(ads.data)
-
-try:
-    orders_df, ads_df = get_data(st.session_state["shop_url"])
-    orders_df['date'] = pd.to_datetime(orders_df['date'])
-    ads_df['date'] = pd.to_datetime(ads_df['date'])
-
-    daily_sales = orders_df.groupby('date')['amount'].sum().reset_index()
-    daily_spend = ads_df.groupby('date')['spend'].sum().reset_index()
-
-    df = pd.merge(daily_sales, daily_spend, on='date', how='outer').fillna(0)
-    df = df.sort_values('date')
-    
-    col_main, col_ai = st.columns([7, 3])
-
-    with col_main:
+    """The shop's full daily history; range filtering happens in charts.chart_frame."""
+    with metrics.span("supabase.daily_metrics"):
+        rows = local_cache.load_table(supabase, shop_url, "daily_metrics")
+    with metrics.span("pandas.daily_frame"):
+        return queries.to_daily_frame(rows)
+
+@st.cache_data(ttl=300)
+def get_ads(shop_url):
+    with metrics.span("supabase.facebook_ads"):
+        return local_cache.load_table(supabase, shop_url, "facebook_ads")
+
+# Compact per-day / per-ad metrics for the AI prompt (see analytics.py)
+@st.cache_data(ttl=300)
+def get_prompt_summary(shop_url):
+    with metrics.span("pandas.analytics"):
+        return analytics.prompt_summary(get_data(shop_url), get_ads(shop_url))
+
+# Sales vs. spend for the chart, resampled and downsampled once per shop and date range (see charts.py)
+@st.cache_data(ttl=300)
+def get_chart_frame(shop_url, start, end):
+    with metrics.span("pandas.chart_frame"):
+        return charts.chart_frame(get_data(shop_url), start, end)
+
+# Instant rule-based recommendations (see rules.py); returns (InsightResponse JSON, conclusive)
+@st.cache_data(ttl=300)
+def get_rule_insights(shop_url):
+    with metrics.span("rules.evaluate"):
+        insights, conclusive = rules.evaluate(get_data(shop_url), get_ads(shop_url))
+    return insights.model_dump_json(), conclusive
+
+# --- FRAGMENTS ---
+# Widgets inside a fragment only rerun that fragment: picking a chart range or editing one
+# draft doesn't re-run data loading, the AI column or the other cards. Each run is timed
+# into the `fragment.<name>` histogram (Prometheus) and shown to admins under the fragment.
+is_admin = st.session_state["shop_url"] in config["ADMIN_SHOPS"]
+
+@contextmanager
+def timed_fragment(name):
+    started = time.perf_counter()
+    with metrics.span(f"fragment.{name}"):
+        yield
+    if is_admin:
+        st.caption(f"⏱️ {name} rerun: {(time.perf_counter() - started) * 1000:.0f}ms")
+
+@st.cache_data(max_entries=32, ttl=3600)
+def parse_insights(text):
+    return InsightResponse.model_validate_json(text)
+
+@st.fragment
+def kpi_chart_section(shop_url):
+    with timed_fragment("kpi_chart"):
+        with metrics.span("get_data"):
+            df = get_data(shop_url)
         kpi1, kpi2, kpi3 = st.columns(3)
         total_sales = df['amount'].sum()
         total_spend = df['spend'].sum()
@@ -159,30 +199,230 @@ try:
 
         st.divider()
         st.subheader("Sales vs. Ad Spend")
-        st.line_chart(df.set_index('date')[['amount', 'spend']], color=["#00CC96", "#EF553B"])
+        if not df.empty:
+            first_day, last_day = df["date"].min().date(), df["date"].max().date()
+            picked = st.date_input("Date range", value=(first_day, last_day),
+                                   min_value=first_day, max_value=last_day, key="chart_range")
+            # Mid-selection only one end is picked; a cleared input returns ()
+            start, end = picked if len(picked) == 2 else (picked[0], last_day) if picked else (first_day, last_day)
+            chart_df, chart_resolution = get_chart_frame(st.session_state["shop_url"], start, end)
+            st.plotly_chart(charts.sales_vs_spend(chart_df), use_container_width=True)
+            st.caption(f"{chart_resolution.capitalize()} totals · {len(chart_df)} points")
+
+@st.fragment
+def recommendation_card(i, rec):
+    # Background drafts/deploys this card shows as in progress (see poll_background_jobs)
+    waiting = st.session_state.setdefault("waiting", set())
+    with timed_fragment("card"):
+        with st.container(border=True):
+            action_color = "red" if rec.action_type == "kill_ad" else "green" if rec.action_type == "scale_ad" else "blue"
+            st.markdown(f":{action_color}[**{rec.action_type.replace('_', ' ').upper()}**] - {rec.target_entity}")
+            st.caption(rec.rationale)
+
+            if rec.action_type == "draft_email":
+                action_text = "Draft Email"
+            elif rec.action_type == "scale_ad":
+                action_text = "Scale Budget"
+            elif rec.action_type == "kill_ad":
+                action_text = "Pause & Replace Ad"
+            else:
+                action_text = "Draft New Campaign"
+
+            with st.expander(f"{action_text} →"):
+                if rec.action_type == "kill_ad":
+                    st.error(f"⚠️ Pause **{rec.target_entity}** immediately.")
+                    st.markdown("### ✨ Replacement Campaign")
+                    draft = get_draft(i, rec)
+                    if draft is None:
+                        st.caption("✍️ Writing your draft...")
+                        waiting.add(("draft", i))
+                    elif draft:
+                        edited_primary = st.text_area("Primary Text", value=draft.primary_text, height=100, key=f"repl_text_{i}")
+                        img_url = "https://images.unsplash.com/photo-1523275335684-37898b6baf30?q=80&w=600&auto=format&fit=crop"
+                        st.image(img_url, caption=f"AI Vision: {draft.image_prompt}")
+
+                        col1, col2 = st.columns([3, 1])
+                        with col1:
+                            edited_headline = st.text_input("Headline", value=draft.headline, key=f"repl_head_{i}")
+                        with col2:
+                            st.button(draft.call_to_action.replace("_", " "), disabled=True, key=f"repl_cta_{i}")
+
+                        st.divider()
+                        if st.button("🔴 Pause Old & ✅ Deploy Replacement to Meta", type="primary", key=f"swap_{i}"):
+                            st.session_state[f"deploy_job_swap_{i}"] = deploy_to_meta(edited_headline, edited_primary, draft.call_to_action, img_url)
+                        if render_deploy_status(f"deploy_job_swap_{i}", "✅ Success! New campaign is PAUSED in Meta Ads Manager."):
+                            waiting.add(("deploy", f"deploy_job_swap_{i}"))
+
+                elif rec.action_type == "scale_ad":
+                    st.info("Let's increase the daily budget.")
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.text_input("Current Daily Budget", value="₹1,500", disabled=True, key=f"cur_budg_{i}")
+                    with col2:
+                        new_budget = st.text_input("New Daily Budget", value="₹2,500", key=f"new_budg_{i}")
+                    if st.button("🚀 Confirm Budget Increase", type="primary", key=f"boost_{i}"):
+                        st.success(f"Budget scaled to {new_budget}!")
+
+                elif rec.action_type == "draft_email":
+                    draft = get_draft(i, rec)
+                    if draft is None:
+                        st.caption("✍️ Writing your draft...")
+                        waiting.add(("draft", i))
+                    elif draft:
+                        st.markdown("### 📧 Email Preview")
+                        st.text_input("Subject Line", value=draft.subject_line, key=f"subj_{i}")
+                        st.text_area("Email Body", value=draft.body_text, height=150, key=f"body_{i}")
+                        if st.button("✅ Push to Klaviyo", type="primary", key=f"send_{i}"):
+                            st.success("Email Synced Successfully!")
+
+                elif rec.action_type == "launch_promo": 
+                    draft = get_draft(i, rec)
+                    if draft is None:
+                        st.caption("✍️ Writing your draft...")
+                        waiting.add(("draft", i))
+                    elif draft:
+                        st.markdown("### 📱 Meta Ad Preview")
+                        edited_primary = st.text_area("Primary Text", value=draft.primary_text, height=100, key=f"text_{i}")
+                        img_url = "https://images.unsplash.com/photo-1523275335684-37898b6baf30?q=80&w=600&auto=format&fit=crop"
+                        st.image(img_url, caption=f"AI Vision: {draft.image_prompt}")
+
+                        col1, col2 = st.columns([3, 1])
+                        with col1:
+                            edited_headline = st.text_input("Headline", value=draft.headline, key=f"head_{i}")
+                        with col2:
+                            st.button(draft.call_to_action.replace("_", " "), disabled=True, key=f"cta_{i}")
+
+                        st.divider()
+                        if st.button("✅ Deploy to Meta Ads Manager", type="primary", key=f"pub_{i}"):
+                            st.session_state[f"deploy_job_pub_{i}"] = deploy_to_meta(edited_headline, edited_primary, draft.call_to_action, img_url)
+                        if render_deploy_status(f"deploy_job_pub_{i}", "✅ Success! Campaign is created and PAUSED in Meta Ads Manager."):
+                            waiting.add(("deploy", f"deploy_job_pub_{i}"))
+
+@st.fragment(run_every=1)
+def poll_background_jobs():
+    """Reruns the page once a draft or Meta deploy that a card is waiting on has finished."""
+    waiting = st.session_state.get("waiting")
+    if not waiting:
+        return
+    futures = st.session_state.get("draft_futures", {})
+    for kind, key in waiting:
+        if kind == "draft":
+            finished = key not in futures or futures[key].done()
+        elif kind == "sync":
+            finished = key not in st.session_state or st.session_state[key].done()
+        else:
+            import meta_deploy
+            finished = meta_deploy.job_status(st.session_state[key])["status"] != "running"
+        if finished:
+            st.rerun()
+
+st.session_state["waiting"] = set()  # Rebuilt by the cards on every full run
+
+def initial_sync_status():
+    """Banner for a just-registered shop's first sync (see auth.py); reloads the shop's data when it lands."""
+    sync = st.session_state.get("initial_sync")
+    if sync is None:
+        return
+    if not sync.done():
+        st.info("⏳ Importing your Shopify orders... the dashboard refreshes when it's done.")
+        st.session_state["waiting"].add(("sync", "initial_sync"))
+        return
+    del st.session_state["initial_sync"]
+    stats = sync.result() if not sync.exception() else {"ok": False, "error": str(sync.exception())}
+    if not stats["ok"]:
+        st.error(f"❌ Shopify sync failed: {stats['error']} (retried by the scheduled sync)")
+        return
+    # Everything cached so far was computed before the orders arrived
+    for cached in (get_data, get_ads, get_prompt_summary, get_chart_frame, get_rule_insights):
+        cached.clear()
+    st.success(f"✅ Imported {stats['rows_written']} Shopify orders.")
+
+initial_sync_status()
+
+def enrich_with_gemini(rule_insights, conclusive, started, live_box):
+    """
+    Streams Gemini's analysis into `live_box`: it sharpens the rule actions' rationale and adds
+    what they missed, or does the whole analysis if no rule fired. Reruns the page with the result.
+    """
+    latency = st.session_state["ai_latency"]
+    data_string = get_prompt_summary(st.session_state["shop_url"])
+    user_prompt = (f"Store metrics as compact JSON (last 7 days, rolling 7/28-day ROAS, anomalies as z-scores, top ads by spend):\n\n{data_string}\n\n"
+                   "Diagnose and give exact recommendations. For ad actions, use an ad_id from `ads` as target_entity.")
+    if conclusive:
+        rule_recs = rule_insights.model_dump_json(include={"recommendations"})
+        user_prompt += (f"\n\nOur rules already recommend these (keep them with the same action_type and target_entity, "
+                        f"write a sharper rationale for each, and add anything they missed):\n{rule_recs}")
+
+    try:
+        # Stream the answer: summary, bottleneck and each finished recommendation show up as they arrive
+        with live_box.container(border=True):
+            st.caption("🧠 Gemini is refining these recommendations...")
+        text = ""
+        for text in llm_cache.stream_json(ANALYSIS_MODEL, ANALYSIS_SYSTEM_PROMPT, user_prompt, InsightResponse, 0.2):
+            latency["ttft"] = latency["ttft"] if latency["ttft"] is not None else time.perf_counter() - started
+            partial = partial_json.parse_partial(text) or {}
+            if not partial.get("summary"):
+                continue
+            with live_box.container(border=True):
+                st.caption("🧠 Gemini is refining these recommendations...")
+                st.markdown(f"**Diagnosis:** {partial['summary']}")
+                if partial.get("primary_bottleneck"):
+                    st.error(f"🚨 **Bottleneck:** {partial['primary_bottleneck']}")
+                # The last recommendation may still be mid-stream, so only show the finished ones
+                for rec in (partial.get("recommendations") or [])[:-1]:
+                    st.markdown(f"**{rec.get('action_type', '').replace('_', ' ').upper()}** - {rec.get('target_entity', '')}")
+
+        if not text:
+            raise ValueError("Gemini returned an empty response")
+        # The final, validated response is what the page renders from now on
+        insights = rules.merge(rule_insights, InsightResponse.model_validate_json(text))
+    except Exception as e:
+        live_box.error(f"AI Error: {e} (showing rule-based recommendations)")
+        return
+
+    st.session_state["ai_insights"] = insights.model_dump_json()
+    st.session_state["ai_latency"] = {**latency, "total": time.perf_counter() - started}
+    prefetch_drafts(insights)
+    st.rerun()
+
+try:
+    col_main, col_ai = st.columns([7, 3])
+
+    with col_main:
+        kpi_chart_section(st.session_state["shop_url"])
 
     with col_ai:
         st.subheader("🧠 AI Strategist")
         st.caption("Your automated growth teammate.")
         
+        enrichment = None
         if st.button("Run Data Analysis 🚀", use_container_width=True):
-            with st.spinner("Analyzing your data..."):
-                try:
-                    data_string = df.tail(7).to_string(index=False) 
-                    system_prompt = "You are a ruthless D2C Growth Consultant. Analyze Shopify and Meta Ads data. Only recommend from these 4 actions: kill_ad, scale_ad, draft_email, launch_promo."
-                    user_prompt = f"Data for last 7 days:\n\n{data_string}\n\nDiagnose and give exact recommendations."
-
-                    model = genai.GenerativeModel('gemini-2.5-flash', system_instruction=system_prompt)
-                    response = model.generate_content(user_prompt, generation_config=genai.GenerationConfig(response_mime_type="application/json", response_schema=InsightResponse, temperature=0.2))
-                    
-                    st.session_state["ai_insights"] = response.text
-                    st.success("Analysis Complete!")
-                except Exception as e:
-                    st.error(f"AI Error: {e}")
+            try:
+                # 1. Rules first: the obvious kill/scale calls render as normal cards in milliseconds
+                started = time.perf_counter()
+                rule_text, conclusive = get_rule_insights(st.session_state["shop_url"])
+                st.session_state["ai_insights"] = rule_text
+                st.session_state["draft_futures"] = {}  # Drafts and deploys from an earlier analysis belong to other cards
+                for key in [k for k in st.session_state if str(k).startswith("deploy_job_")]:
+                    del st.session_state[key]
+                prefetch_drafts(parse_insights(rule_text))
+                elapsed = time.perf_counter() - started
+                st.session_state["ai_latency"] = {"rules": elapsed, "ttft": None, "total": elapsed}
+                # 2. Gemini runs once the cards below are on screen (see enrich_with_gemini)
+                if not rules_only:
+                    enrichment = (parse_insights(rule_text), conclusive, started)
+            except Exception as e:
+                st.error(f"AI Error: {e}")
+        enrich_box = st.empty()  # Gemini's answer streams here while the rule cards are usable
+
+        if "ai_latency" in st.session_state:
+            latency = st.session_state["ai_latency"]
+            first_token = f" · First token {latency['ttft']:.2f}s" if latency["ttft"] is not None else ""
+            st.caption(f"⏱️ Rules {latency['rules'] * 1000:.0f}ms{first_token} · Total {latency['total']:.2f}s")
 
         # Display Insights
         if "ai_insights" in st.session_state:
-            insights = InsightResponse.model_validate_json(st.session_state["ai_insights"])
+            insights = parse_insights(st.session_state["ai_insights"])
             
             with st.container(border=True):
                 st.markdown(f"**Diagnosis:** {insights.summary}")
@@ -192,92 +432,23 @@ try:
             st.markdown("**🎯 Recommended Actions:**")
             
             for i, rec in enumerate(insights.recommendations):
-                with st.container(border=True):
-                    action_color = "red" if rec.action_type == "kill_ad" else "green" if rec.action_type == "scale_ad" else "blue"
-                    st.markdown(f":{action_color}[**{rec.action_type.replace('_', ' ').upper()}**] - {rec.target_entity}")
-                    st.caption(rec.rationale)
-                    
-                    if rec.action_type == "draft_email":
-                        action_text = "Draft Email"
-                    elif rec.action_type == "scale_ad":
-                        action_text = "Scale Budget"
-                    elif rec.action_type == "kill_ad":
-                        action_text = "Pause & Replace Ad"
-                    else:
-                        action_text = "Draft New Campaign"
-                    
-                    with st.expander(f"{action_text} →"):
-                        if rec.action_type == "kill_ad":
-                            st.error(f"⚠️ Pause **{rec.target_entity}** immediately.")
-                            st.markdown("### ✨ Replacement Campaign")
-                            with st.spinner("Writing replacement ad..."):
-                                raw_draft = generate_ad_draft("launch_replacement", rec.target_entity, "Write a fresh ad.")
-                                draft = AdCreativeDraft.model_validate_json(raw_draft)
-                                
-                            edited_primary = st.text_area("Primary Text", value=draft.primary_text, height=100, key=f"repl_text_{i}")
-                            img_url = "https://images.unsplash.com/photo-1523275335684-37898b6baf30?q=80&w=600&auto=format&fit=crop"
-                            st.image(img_url, caption=f"AI Vision: {draft.image_prompt}")
-                            
-                            col1, col2 = st.columns([3, 1])
-                            with col1:
-                                edited_headline = st.text_input("Headline", value=draft.headline, key=f"repl_head_{i}")
-                            with col2:
-                                st.button(draft.call_to_action.replace("_", " "), disabled=True, key=f"repl_cta_{i}")
-                                
-                            st.divider()
-                            if st.button("🔴 Pause Old & ✅ Deploy Replacement to Meta", type="primary", key=f"swap_{i}"):
-                                with st.spinner("Connecting to Meta Ads Manager..."):
-                                    result = deploy_to_meta(edited_headline, edited_primary, draft.call_to_action, img_url)
-                                    if "ERROR" in result:
-                                        st.error(result)
-                                    else:
-                                        st.success("✅ Success! New campaign is PAUSED in Meta Ads Manager.")
-                                        st.balloons()
-
-                        elif rec.action_type == "scale_ad":
-                            st.info("Let's increase the daily budget.")
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                st.text_input("Current Daily Budget", value="₹1,500", disabled=True, key=f"cur_budg_{i}")
-                            with col2:
-                                new_budget = st.text_input("New Daily Budget", value="₹2,500", key=f"new_budg_{i}")
-                            if st.button("🚀 Confirm Budget Increase", type="primary", key=f"boost_{i}"):
-                                st.success(f"Budget scaled to {new_budget}!")
-                        
-                        elif rec.action_type == "draft_email":
-                            with st.spinner("Writing email..."):
-                                raw_draft = generate_email_draft(rec.target_entity, rec.rationale)
-                                draft = EmailDraft.model_validate_json(raw_draft)
-                            st.markdown("### 📧 Email Preview")
-                            st.text_input("Subject Line", value=draft.subject_line, key=f"subj_{i}")
-                            st.text_area("Email Body", value=draft.body_text, height=150, key=f"body_{i}")
-                            if st.button("✅ Push to Klaviyo", type="primary", key=f"send_{i}"):
-                                st.success("Email Synced Successfully!")
-
-                        elif rec.action_type == "launch_promo": 
-                            with st.spinner("Writing ad copy..."):
-                                raw_draft = generate_ad_draft(rec.action_type, rec.target_entity, rec.rationale)
-                                draft = AdCreativeDraft.model_validate_json(raw_draft)
-                            st.markdown("### 📱 Meta Ad Preview")
-                            edited_primary = st.text_area("Primary Text", value=draft.primary_text, height=100, key=f"text_{i}")
-                            img_url = "https://images.unsplash.com/photo-1523275335684-37898b6baf30?q=80&w=600&auto=format&fit=crop"
-                            st.image(img_url, caption=f"AI Vision: {draft.image_prompt}")
-                            
-                            col1, col2 = st.columns([3, 1])
-                            with col1:
-                                edited_headline = st.text_input("Headline", value=draft.headline, key=f"head_{i}")
-                            with col2:
-                                st.button(draft.call_to_action.replace("_", " "), disabled=True, key=f"cta_{i}")
-                            
-                            st.divider()
-                            if st.button("✅ Deploy to Meta Ads Manager", type="primary", key=f"pub_{i}"):
-                                with st.spinner("Connecting to Meta Ads Manager..."):
-                                    result = deploy_to_meta(edited_headline, edited_primary, draft.call_to_action, img_url)
-                                    if "ERROR" in result:
-                                        st.error(result)
-                                    else:
-                                        st.success("✅ Success! Campaign is created and PAUSED in Meta Ads Manager.")
-                                        st.balloons()
+                recommendation_card(i, rec)
+        poll_background_jobs()  # Cards' drafts/deploys and the initial sync banner
+
+        if enrichment:
+            enrich_with_gemini(*enrichment, enrich_box)
 
 except Exception as e:
-    st.error(f"Waiting for data... ({e})")
\ No newline at end of file
+    st.error(f"Waiting for data... ({e})")
+
+check_startup_budget("dashboard", DASHBOARD_BUDGET_MS)
+
+# Admin-only breakdown of where this rerun spent its time
+if is_admin:
+    with latency_panel.container():
+        st.markdown("**⏱️ This rerun**")
+        st.caption(f"Total: {(time.perf_counter() - RUN_STARTED) * 1000:.0f}ms")
+        for name, seconds in run_spans:
+            st.caption(f"{name}: {seconds * 1000:.0f}ms")
+        if metrics_server:
+            st.caption(f"Prometheus: http://localhost:{metrics_server.server_address[1]}/metrics")
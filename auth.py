@@ -1,15 +1,11 @@
 import streamlit as st
-import os
 import time
-from supabase import create_client
-from dotenv import load_dotenv
-import ingest_shopify  # This imports your data fetching script
+from concurrent.futures import ThreadPoolExecutor
+from clients import get_supabase  # Shared per-process client, created on first click
+import bulk_writer  # Retried, minimal-return upserts
 
-# 1. Load Secrets
-load_dotenv("secrets.txt")
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SERVICE_ROLE_KEY")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+# First syncs of newly registered shops; the dashboard polls the future and reloads when it lands
+_sync_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="initial-sync")
 
 def login_form():
     """Handles Login and Registration logic"""
@@ -25,7 +21,7 @@ def login_form():
         if shop_url:
             try:
                 # Check if this shop exists in our DB
-                response = supabase.table("shops").select("*").eq("shop_url", shop_url).execute()
+                response = get_supabase().table("shops").select("*").eq("shop_url", shop_url).execute()
                 
                 if response.data:
                     # User exists! Log them in.
@@ -50,13 +46,15 @@ def login_form():
             try:
                 # 1. Save User to Database
                 data = {"shop_url": shop_url, "access_token": token}
-                supabase.table("shops").upsert(data).execute()
+                bulk_writer.write(get_supabase(), [data], key=("shop_url",), table="shops")
                 
-                # 2. TRIGGER IMMEDIATE DATA SYNC ⚡
-                # This calls the function in ingest_shopify.py to get real data now
-                with st.spinner("⏳ Connecting to Shopify & Fetching Orders..."):
-                    # We pass the supabase client so the script can save data
-                    ingest_shopify.fetch_orders(shop_url, token, supabase)
+                # 2. KICK OFF DATA SYNC IN THE BACKGROUND ⚡
+                # The first sync can take minutes for big stores, so we don't block the UI on it.
+                # Later refreshes come from `python sync_shops.py` using the stored watermark.
+                shop = {"shop_url": shop_url, "access_token": token}
+                import sync_shops  # Incremental Shopify sync (wraps ingest_shopify.fetch_orders)
+                st.session_state["initial_sync"] = _sync_pool.submit(sync_shops.sync_shop, shop, get_supabase())
+                st.info("⏳ Fetching your Shopify orders in the background...")
                 
                 # 3. Auto-Login after success
                 st.success("✅ Registration Successful! Logging you in...")
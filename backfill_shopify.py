@@ -0,0 +1,194 @@
+import json
+import os
+import re
+import sys
+import time
+import requests
+import bulk_writer
+import ingest_shopify
+import metrics
+
+# Historical order backfill via Shopify's GraphQL Bulk Operations:
+#
+#   python backfill_shopify.py <shop_url>
+#
+# Submits a bulkOperationRunQuery, waits for it, then streams the resulting JSONL file line by
+# line (never loading it whole) into the same rows `fetch_orders` writes, in large batches.
+# Progress is checkpointed by byte offset so an interrupted run resumes where it stopped.
+
+BULK_QUERY = """
+{
+  orders {
+    edges {
+      node {
+        legacyResourceId
+        createdAt
+        updatedAt
+        email
+        totalPriceSet { shopMoney { amount currencyCode } }
+      }
+    }
+  }
+}
+"""
+SUBMIT_MUTATION = """
+mutation run($query: String!) {
+  bulkOperationRunQuery(query: $query) {
+    bulkOperation { id status }
+    userErrors { field message }
+  }
+}
+"""
+POLL_QUERY = "{ currentBulkOperation { id status errorCode objectCount url } }"
+
+BATCH_SIZE = 5000
+POLL_INTERVAL = 5
+CHECKPOINT_DIR = os.path.join(".cache", "backfill")
+
+
+def _graphql(shop_url, access_token, query, variables=None, base_url=None):
+    url = f"{base_url or 'https://' + shop_url}/admin/api/{ingest_shopify.API_VERSION}/graphql.json"
+    response = requests.post(url, json={"query": query, "variables": variables or {}}, timeout=30,
+                             headers={"X-Shopify-Access-Token": access_token, "Content-Type": "application/json"})
+    response.raise_for_status()
+    payload = response.json()
+    if payload.get("errors"):
+        raise requests.HTTPError(str(payload["errors"]), response=response)
+    return payload["data"]
+
+
+def run_bulk_query(shop_url, access_token, base_url=None):
+    """Starts the bulk export and blocks until it completes; returns the JSONL URL (None if no orders)."""
+    result = _graphql(shop_url, access_token, SUBMIT_MUTATION, {"query": BULK_QUERY}, base_url)["bulkOperationRunQuery"]
+    if result["userErrors"]:
+        raise requests.HTTPError(str(result["userErrors"]))
+    print(f"⏳ Bulk operation {result['bulkOperation']['id']} submitted...")
+
+    while True:
+        op = _graphql(shop_url, access_token, POLL_QUERY, base_url=base_url)["currentBulkOperation"]
+        if op["status"] == "COMPLETED":
+            print(f"✅ Export ready: {op['objectCount']} objects")
+            return op["url"]
+        if op["status"] in ("FAILED", "CANCELED", "EXPIRED"):
+            raise requests.HTTPError(f"Bulk operation {op['id']} {op['status']}: {op.get('errorCode')}")
+        time.sleep(POLL_INTERVAL)
+
+
+def node_to_order(node):
+    """Maps a bulk-export order node onto the REST order shape `format_order` expects."""
+    money = node["totalPriceSet"]["shopMoney"]
+    return {
+        "id": node["legacyResourceId"],
+        "created_at": node["createdAt"],
+        "updated_at": node["updatedAt"],
+        "total_price": money["amount"],
+        "currency": money["currencyCode"],
+        "email": node.get("email"),
+    }
+
+
+def _checkpoint_path(shop_url):
+    return os.path.join(CHECKPOINT_DIR, re.sub(r"[^A-Za-z0-9._-]", "_", shop_url) + ".json")
+
+
+def _load_checkpoint(shop_url):
+    try:
+        with open(_checkpoint_path(shop_url)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _save_checkpoint(shop_url, checkpoint):
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    path = _checkpoint_path(shop_url)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def iter_jsonl(url, offset=0):
+    """Streams (line_bytes, end_offset) from the JSONL file starting at byte `offset`."""
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    with requests.get(url, headers=headers, stream=True, timeout=(10, 300)) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        skip = offset if offset and response.status_code != 206 else 0  # Server ignored Range
+        position = offset - skip
+        for line in response.raw:
+            position += len(line)
+            if position <= offset:
+                continue
+            yield line, position
+
+
+def backfill(shop_url, access_token, supabase_client, base_url=None, jsonl_url=None, batch_size=BATCH_SIZE):
+    """
+    Backfills every historical order for a shop. Pass `jsonl_url` to skip the GraphQL
+    export and stream an existing file (e.g. a local fixture). Re-running after an
+    interruption resumes from the last saved batch.
+
+    Returns a stats dict like `fetch_orders`: {"ok", "rows_written", "seconds", "error", "max_updated_at"}.
+    """
+    started = time.perf_counter()
+    stats = {"ok": True, "rows_written": 0, "seconds": 0.0, "error": None, "max_updated_at": None}
+
+    try:
+        checkpoint = _load_checkpoint(shop_url)
+        if checkpoint and (jsonl_url is None or checkpoint["url"] == jsonl_url):
+            print(f"↩️ Resuming backfill at byte {checkpoint['offset']:,} ({checkpoint['rows']:,} rows done)")
+        else:
+            checkpoint = {"url": jsonl_url or run_bulk_query(shop_url, access_token, base_url), "offset": 0, "rows": 0,
+                          "max_updated_at": None}
+            if checkpoint["url"] is None:
+                return stats  # Shop has no orders
+            _save_checkpoint(shop_url, checkpoint)
+
+        batch, batch_end = [], checkpoint["offset"]
+
+        def write(batch, end):
+            with metrics.span("backfill.batch"):
+                result = bulk_writer.write_orders(supabase_client, batch)
+            checkpoint.update(offset=end, rows=checkpoint["rows"] + result["rows"])
+            _save_checkpoint(shop_url, checkpoint)
+            stats["rows_written"] += result["rows"]
+            print(f"   {checkpoint['rows']:,} orders saved ({result['rows_per_sec']:,} rows/s)")
+
+        for line, end in iter_jsonl(checkpoint["url"], checkpoint["offset"]):
+            if line.strip():
+                order = node_to_order(json.loads(line))
+                batch.append(ingest_shopify.format_order(order, shop_url))
+                checkpoint["max_updated_at"] = max(filter(None, [checkpoint["max_updated_at"], order["updated_at"]]))
+            batch_end = end
+            if len(batch) >= batch_size:
+                write(batch, batch_end)
+                batch = []
+        if batch:
+            write(batch, batch_end)
+
+        stats["max_updated_at"] = checkpoint["max_updated_at"]
+        os.remove(_checkpoint_path(shop_url))  # Finished; the next backfill starts fresh
+    except requests.HTTPError as e:
+        print(f"❌ Error fetching from Shopify: {e}")
+        stats.update(ok=False, error=str(e))
+    except Exception as e:
+        print(f"   ⚠️ Backfill interrupted (will resume): {e}")
+        stats.update(ok=False, error=str(e))
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    if stats["ok"]:
+        print(f"✅ Backfilled {stats['rows_written']} orders in {stats['seconds']}s!")
+    return stats
+
+
+if __name__ == "__main__":
+    import clients
+    clients.load_config()
+    supabase = clients.get_supabase()
+    shop_url = sys.argv[1]
+    shop = supabase.table("shops").select("access_token").eq("shop_url", shop_url).execute().data[0]
+    stats = backfill(shop_url, shop["access_token"], supabase, base_url=os.getenv("SHOPIFY_BASE_URL"))
+
+    # Hand over to the incremental sync (sync_shops.py) from where the export ended
+    if stats["ok"] and stats["max_updated_at"]:
+        supabase.table("shops").update({"orders_updated_at_min": stats["max_updated_at"]}).eq("shop_url", shop_url).execute()
@@ -0,0 +1,417 @@
+import base64
+import bisect
+import json
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+# Local stand-ins for Shopify, Supabase (PostgREST), Gemini and the Meta Graph API.
+# Each fake runs an HTTPServer on a free localhost port in a daemon thread.
+
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler, **state):
+        super().__init__(("127.0.0.1", 0), handler)
+        self.state = state
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+def serve(handler, **state):
+    """Starts a fake in the background and returns the server (see `.url`, `.shutdown()`)."""
+    server = FakeServer(handler, **state)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real APIs
+
+    def log_message(self, format, *args):
+        pass
+
+    def body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def send_json(self, payload, status=200, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+# --- SHOPIFY ---
+SHOPIFY_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def fake_order(i, n_orders):
+    """Deterministic order #i of `n_orders`, spread evenly over one year."""
+    ts = SHOPIFY_EPOCH + timedelta(seconds=i * 365 * 86400 // max(n_orders, 1))
+    return {
+        "id": 1_000_000 + i,
+        "created_at": ts.isoformat(),
+        "updated_at": ts.isoformat(),
+        "total_price": f"{500 + (i * 7919) % 4500}.00",
+        "currency": "INR",
+        "email": f"user{i % 1000}@example.com",
+    }
+
+
+class ShopifyHandler(JSONHandler):
+    """GET /admin/api/<v>/orders.json with page_info cursors and a leaky-bucket call limit."""
+
+    def do_GET(self):
+        state, url = self.server.state, urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        n = state["n_orders"]
+
+        with self.server.lock:
+            now = time.monotonic()
+            state["bucket"] = max(0.0, state["bucket"] - (now - state["last_call"]) * state["leak_per_sec"])
+            state["last_call"] = now
+            if state["bucket"] + 1 > state["bucket_size"]:
+                return self.send_json({"errors": "Exceeded 2 calls per second"}, 429, {"Retry-After": "1.0"})
+            state["bucket"] += 1
+            used = int(state["bucket"])
+
+        limit = min(int(params.get("limit", 50)), 250)
+        if "page_info" in params:
+            start = int(base64.urlsafe_b64decode(params["page_info"]).decode())
+        elif params.get("updated_at_min"):
+            since = datetime.fromisoformat(params["updated_at_min"])
+            start = max(0, -(-int((since - SHOPIFY_EPOCH).total_seconds()) * n // (365 * 86400)))
+        else:
+            start = 0
+
+        orders = [fake_order(i, n) for i in range(start, min(start + limit, n))]
+        headers = {"X-Shopify-Shop-Api-Call-Limit": f"{used}/{state['bucket_size']}"}
+        if start + limit < n:
+            cursor = base64.urlsafe_b64encode(str(start + limit).encode()).decode()
+            headers["Link"] = f'<{self.server.url}{url.path}?limit={limit}&page_info={cursor}>; rel="next"'
+        self.send_json({"orders": orders}, headers=headers)
+
+
+def shopify(n_orders, leak_per_sec=2.0, bucket_size=40):
+    return serve(ShopifyHandler, n_orders=n_orders, leak_per_sec=leak_per_sec, bucket_size=bucket_size,
+                 bucket=0.0, last_call=time.monotonic())
+
+
+# --- SUPABASE / POSTGREST ---
+TABLE_KEYS = {
+    "shopify_orders": ("order_id",),
+    "facebook_ads": ("ad_id", "date"),
+    "daily_metrics": ("shop_url", "date"),
+    "shops": ("shop_url",),
+}
+OPS = {
+    "eq": lambda a, b: a == b, "gt": lambda a, b: a > b, "gte": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b, "lte": lambda a, b: a <= b,
+}
+KEYSET_OR = re.compile(r'^\((\w+)\.gt\."?([^",]*)"?,and\(\1\.eq\."?([^",]*)"?,(\w+)\.gt\."?([^",)]*)"?\)\)$')
+
+
+def _compare(value, op, raw):
+    if value is None:
+        return False
+    other = type(value)(raw) if isinstance(value, (int, float)) else raw
+    return OPS[op](value if isinstance(value, (int, float)) else str(value), other)
+
+
+class PostgRESTStore:
+    """In-memory tables with upserts, rollup RPCs and sorted views for keyset reads."""
+
+    def __init__(self):
+        self.tables = {name: {} for name in TABLE_KEYS}
+        self.version = 0
+        self._sorted = {}
+        self.lock = threading.Lock()
+
+    def _now(self):
+        return datetime.now(timezone.utc).isoformat()
+
+    def upsert(self, table, rows):
+        keys = TABLE_KEYS[table]
+        with self.lock:
+            store = self.tables.setdefault(table, {})
+            for row in rows:
+                key = tuple(row[k] for k in keys)
+                store[key] = {**store.get(key, {}), **row, "updated_at": self._now()}
+            self.version += 1
+
+    def _bump(self, shop_url, date, **deltas):
+        row = self.tables["daily_metrics"].setdefault((shop_url, date), {
+            "shop_url": shop_url, "date": date, "sales": 0.0, "orders": 0,
+            "spend": 0.0, "clicks": 0, "impressions": 0})
+        for column, delta in deltas.items():
+            row[column] += delta
+        row["updated_at"] = self._now()
+
+    def upsert_with_rollup(self, table, rows):
+        """Python twin of upsert_orders_with_rollup / upsert_ads_with_rollup in schema.sql."""
+        keys = TABLE_KEYS[table]
+        with self.lock:
+            store = self.tables[table]
+            for row in rows:
+                key = tuple(row[k] for k in keys)
+                old = store.get(key)
+                if table == "shopify_orders":
+                    if old:
+                        self._bump(old["shop_url"], old["date"], sales=-old["amount"], orders=-1)
+                    self._bump(row["shop_url"], row["date"], sales=row["amount"], orders=1)
+                else:
+                    if old:
+                        self._bump(old["shop_url"], old["date"], spend=-old["spend"], clicks=-old["clicks"], impressions=-old["impressions"])
+                    self._bump(row["shop_url"], row["date"], spend=row["spend"], clicks=row["clicks"], impressions=row["impressions"])
+                store[key] = {**row, "updated_at": self._now()}
+            self.version += 1
+        return len(rows)
+
+    def select(self, table, params):
+        order = [part.split(".") for part in params.pop("order", "").split(",") if part]
+        order_cols = tuple(col for col, *_ in order) or TABLE_KEYS.get(table, ())
+        columns = params.pop("select", "*")
+        limit = int(params.pop("limit", 10 ** 9))
+        keyset = KEYSET_OR.match(params.pop("or", ""))
+
+        with self.lock:
+            cache_key = (table, order_cols)
+            version, rows, index = self._sorted.get(cache_key, (None, None, None))
+            if version != self.version:
+                rows = sorted(self.tables.get(table, {}).values(), key=lambda r: tuple(str(r.get(c)) for c in order_cols))
+                index = [str(r.get(order_cols[0])) for r in rows] if order_cols else []
+                self._sorted[cache_key] = (self.version, rows, index)
+
+        filters = [(col, *raw.split(".", 1)) for col, raw in params.items()]
+        start = 0
+        # Keyset predicates on the leading sort column jump straight to the right offset
+        for col, op, raw in filters:
+            if order_cols and col == order_cols[0] and op in ("gt", "gte"):
+                start = (bisect.bisect_right if op == "gt" else bisect.bisect_left)(index, raw)
+        if keyset and order_cols and keyset.group(1) == order_cols[0]:
+            start = max(start, bisect.bisect_left(index, keyset.group(2)))
+
+        out = []
+        for row in rows[start:]:
+            if not all(_compare(row.get(col), op, raw) for col, op, raw in filters):
+                continue
+            if keyset:
+                k1, v1, _, k2, v2 = keyset.groups()
+                if not (str(row[k1]) > v1 or (str(row[k1]) == v1 and str(row[k2]) > v2)):
+                    continue
+            out.append(row if columns == "*" else {c: row.get(c) for c in columns.split(",")})
+            if len(out) >= limit:
+                break
+        return out
+
+    def update(self, table, params, values):
+        with self.lock:
+            filters = [(col, *raw.split(".", 1)) for col, raw in params.items()]
+            for row in self.tables.get(table, {}).values():
+                if all(_compare(row.get(col), op, raw) for col, op, raw in filters):
+                    row.update(values, updated_at=self._now())
+            self.version += 1
+
+
+class PostgRESTHandler(JSONHandler):
+    """Just enough of PostgREST's /rest/v1 surface for supabase-py."""
+
+    def _route(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        parts = url.path.split("/rest/v1/", 1)[-1].split("/")
+        return parts, params
+
+    def do_GET(self):
+        (table, *_), params = self._route()
+        self.send_json(self.server.state["store"].select(table, params))
+
+    def do_POST(self):
+        parts, params = self._route()
+        store, payload = self.server.state["store"], json.loads(self.body() or b"null")
+        if parts[0] == "rpc":
+            table = {"upsert_orders_with_rollup": "shopify_orders", "upsert_ads_with_rollup": "facebook_ads"}[parts[1]]
+            return self.send_json(store.upsert_with_rollup(table, payload["p_rows"]))
+        rows = payload if isinstance(payload, list) else [payload]
+        store.upsert(parts[0], rows)
+        self.send_json(rows if "return=representation" in self.headers.get("Prefer", "") else [], 201)
+
+    def do_PATCH(self):
+        (table, *_), params = self._route()
+        self.server.state["store"].update(table, params, json.loads(self.body()))
+        self.send_json([])
+
+
+def postgrest(store=None):
+    return serve(PostgRESTHandler, store=store or PostgRESTStore())
+
+
+# --- GEMINI ---
+CANNED = {
+    "ad": {"headline": "Your new favourite watch", "primary_text": "Crafted for every day. Free shipping today.",
+           "call_to_action": "SHOP_NOW", "image_prompt": "A minimalist watch on a marble table"},
+    "email": {"subject_line": "We saved your cart 👀", "body_text": "Come back and get 10% off your order."},
+    "insight": {"summary": "Spend outpaced sales this week. ROAS fell below 1.",
+                "primary_bottleneck": "Low conversion on top-spend ads.",
+                "recommendations": [
+                    {"action_type": "kill_ad", "confidence_score": 90, "rationale": "ROAS 0.4x.", "target_entity": "ad_1"},
+                    {"action_type": "scale_ad", "confidence_score": 80, "rationale": "ROAS 3.1x.", "target_entity": "ad_2"},
+                    {"action_type": "draft_email", "confidence_score": 70, "rationale": "Cart abandoners.", "target_entity": "abandoned_carts"},
+                    {"action_type": "launch_promo", "confidence_score": 65, "rationale": "Weekend dip.", "target_entity": "bestsellers"},
+                    {"action_type": "launch_promo", "confidence_score": 60, "rationale": "New arrivals.", "target_entity": "new_collection"},
+                ]},
+}
+
+
+class GeminiHandler(JSONHandler):
+    """Canned `generateContent` / `streamGenerateContent` replies after a configurable latency."""
+
+    def do_POST(self):
+        request = json.loads(self.body())
+        system = " ".join(p.get("text", "") for p in request.get("systemInstruction", {}).get("parts", []))
+        kind = "ad" if "Facebook ads" in system else "email" if "email" in system else "insight"
+        text = json.dumps(CANNED[kind])
+        time.sleep(self.server.state["latency"])
+
+        def reply(chunk):
+            return {"candidates": [{"content": {"parts": [{"text": chunk}], "role": "model"}, "finishReason": "STOP", "index": 0}]}
+
+        if ":streamGenerateContent" not in self.path:
+            return self.send_json(reply(text))
+
+        # The REST transport streams a JSON array of responses; send it in three chunks
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        step = len(text) // 3 + 1
+        chunks = [json.dumps(reply(text[i:i + step])) for i in range(0, len(text), step)]
+        for i, chunk in enumerate(chunks):
+            self.wfile.write(("[" if i == 0 else ",").encode() + chunk.encode())
+            self.wfile.flush()
+            time.sleep(self.server.state["latency"] / 10)
+        self.wfile.write(b"]")
+        self.close_connection = True
+
+
+def gemini(latency=0.5):
+    return serve(GeminiHandler, latency=latency)
+
+
+# --- META GRAPH API ---
+class GraphHandler(JSONHandler):
+    """
+    Image download, /adimages uploads, batch requests and ad insights (sync pages and async
+    report runs, with cursor paging), each after a configurable latency.
+    """
+
+    def do_GET(self):
+        time.sleep(self.server.state["latency"])
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        parts = url.path.strip("/").split("/")
+        if parts[-1] == "insights":
+            if parts[-2].startswith("report_"):  # Results of an async report run
+                query = {**self.server.state["reports"][parts[-2]]["params"], **query}
+            return self.send_insights(query)
+        if parts[-1].startswith("report_"):  # Async report status: running on the first poll, then done
+            report = self.server.state["reports"][parts[-1]]
+            report["polls"] += 1
+            done = report["polls"] > 1
+            return self.send_json({"id": parts[-1], "async_status": "Job Completed" if done else "Job Running",
+                                   "async_percent_completion": 100 if done else 50})
+
+        data = b"\xff\xd8\xff" + b"0" * 50_000  # ~50 KB "JPEG"
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_insights(self, query):
+        """One page of ad/day insights for `time_range`, paged with base64 offset cursors like Meta's."""
+        time_range = json.loads(query["time_range"])
+        start, end = (datetime.fromisoformat(time_range[k]).date() for k in ("since", "until"))
+        n_ads, limit = self.server.state["n_ads"], int(query.get("limit", 25))
+        total = ((end - start).days + 1) * n_ads
+        offset = int(base64.b64decode(query["after"])) if query.get("after") else 0
+
+        rows = []
+        for i in range(offset, min(offset + limit, total)):
+            day, ad = start + timedelta(days=i // n_ads), i % n_ads
+            rows.append({"ad_id": f"ad_{ad}", "date_start": day.isoformat(), "date_stop": day.isoformat(),
+                         "spend": f"{100 + ad:.2f}", "clicks": str(10 + ad), "impressions": str(1000 + ad),
+                         "actions": [{"action_type": "purchase", "value": str(ad % 4)}]})
+        paging = {"cursors": {"before": base64.b64encode(str(offset).encode()).decode(),
+                              "after": base64.b64encode(str(offset + len(rows)).encode()).decode()}}
+        if offset + len(rows) < total:
+            paging["next"] = f"{self.server.url}{urlparse(self.path).path}"
+        self.send_json({"data": rows, "paging": paging})
+
+    def do_POST(self):
+        time.sleep(self.server.state["latency"])
+        body = self.body()
+        with self.server.lock:
+            self.server.state["calls"] += 1
+            call = self.server.state["calls"]
+        if self.path.rstrip("/").endswith("/adimages"):
+            return self.send_json({"images": {"ad.jpg": {"hash": f"hash{call}"}}})
+        if self.path.rstrip("/").endswith("/insights"):
+            report_id = f"report_{call}"
+            params = {k: v[0] for k, v in parse_qs(body.decode()).items()}
+            with self.server.lock:
+                self.server.state["reports"][report_id] = {"params": params, "polls": 0}
+            return self.send_json({"report_run_id": report_id})
+        batch = json.loads(parse_qs(body.decode()).get("batch", ["[]"])[0])
+        # Like Meta: ops referenced by a later {result=name:...} come back as null unless they
+        # set omit_response_on_success=false
+        referenced = {name for op in batch for name in re.findall(r"result=(\w+):", unquote(op.get("body", "")))}
+        self.send_json([None if op["name"] in referenced and op.get("omit_response_on_success", True)
+                        else {"code": 200, "body": json.dumps({"id": f"{op['name']}_{call}"})} for op in batch])
+
+
+def graph(latency=0.1, n_ads=20):
+    return serve(GraphHandler, latency=latency, calls=0, n_ads=n_ads, reports={})
+
+
+# --- SHOPIFY BULK EXPORT FILE ---
+class JSONLHandler(BaseHTTPRequestHandler):
+    """Serves a bulk-operation JSONL fixture, honouring `Range: bytes=N-` like the real CDN."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        data = self.server.state["data"]
+        match = re.match(r"bytes=(\d+)-", self.headers.get("Range", ""))
+        start = int(match.group(1)) if match else 0
+        self.send_response(206 if match else 200)
+        self.send_header("Content-Type", "application/jsonl")
+        self.send_header("Content-Length", str(len(data) - start))
+        self.end_headers()
+        self.wfile.write(data[start:])
+
+
+def bulk_order_node(i, n_orders):
+    order = fake_order(i, n_orders)
+    return {"id": f"gid://shopify/Order/{order['id']}", "legacyResourceId": str(order["id"]),
+            "createdAt": order["created_at"], "updatedAt": order["updated_at"], "email": order["email"],
+            "totalPriceSet": {"shopMoney": {"amount": order["total_price"], "currencyCode": order["currency"]}}}
+
+
+def jsonl_fixture(n_orders):
+    """Serves `n_orders` bulk-export order lines at `<server.url>/orders.jsonl`."""
+    data = "".join(json.dumps(bulk_order_node(i, n_orders)) + "\n" for i in range(n_orders)).encode()
+    return serve(JSONLHandler, data=data)
@@ -0,0 +1,229 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from bench import fakes
+
+# Offline benchmarks for the hot paths, run against the local fakes in bench/fakes.py.
+#
+#   python -m bench.run --sizes 1000,100000 --out bench_results.json
+#   python -m bench.run --compare bench_results.json     # diff against an earlier commit's run
+
+SHOP_URL = "bench-shop.myshopify.com"
+N_ADS = 20
+FAKE_KEY = "bench.bench.bench"  # supabase-py only checks the key's shape
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, round(time.perf_counter() - started, 4)
+
+
+def seed_ads(store, days):
+    rows = [{"ad_id": f"ad_{a}", "shop_url": SHOP_URL, "date": day, "spend": 100.0 + a,
+             "clicks": 10 + a, "impressions": 1000 + a} for day in days for a in range(N_ADS)]
+    store.upsert_with_rollup("facebook_ads", rows)
+    return len(rows)
+
+
+def bench_data(size, leak_per_sec):
+    """fetch_orders -> daily_metrics rollup -> get_data (cold/warm cache) and the legacy groupby/merge."""
+    from supabase import create_client
+    import pandas as pd
+    import ingest_shopify
+    import local_cache
+    import queries
+
+    results = {}
+    store = fakes.PostgRESTStore()
+    db, shop = fakes.postgrest(store), fakes.shopify(size, leak_per_sec=leak_per_sec)
+    try:
+        supabase = create_client(db.url, FAKE_KEY)
+
+        stats, seconds = timed(ingest_shopify.fetch_orders, SHOP_URL, "token", supabase, base_url=shop.url)
+        if not stats["ok"] or stats["rows_written"] != size:
+            raise RuntimeError(f"fetch_orders: expected {size} rows, got {stats}")
+        results["fetch_orders"] = {"seconds": seconds, "rows": stats["rows_written"], "pages": len(stats["pages"]),
+                                   "rows_per_sec": round(stats["rows_written"] / seconds, 1)}
+
+        days = sorted({row["date"] for row in store.tables["daily_metrics"].values()})
+        seed_ads(store, days)
+
+        local_cache.CACHE_DIR = tempfile.mkdtemp(prefix="growifyx-bench-")
+        for label in ("get_data_cold", "get_data_warm"):
+            df, seconds = timed(lambda: queries.to_daily_frame(local_cache.load_table(supabase, SHOP_URL, "daily_metrics")))
+            results[label] = {"seconds": seconds, "days": len(df)}
+        if results["get_data_cold"]["days"] != results["get_data_warm"]["days"]:
+            raise RuntimeError(f"get_data: cold and warm cache disagree ({results['get_data_cold']} vs {results['get_data_warm']})")
+
+        # The original dashboard path: every raw row, then groupby + outer merge in pandas
+        orders_df, fetch_orders_s = timed(queries.fetch_rows, supabase, "shopify_orders", SHOP_URL, key="order_id",
+                                          columns="order_id,date,amount")
+        ads_df, fetch_ads_s = timed(queries.fetch_rows, supabase, "facebook_ads", SHOP_URL, key=("ad_id", "date"),
+                                    columns="ad_id,date,spend")
+
+        def groupby_merge():
+            orders_df["date"] = pd.to_datetime(orders_df["date"])
+            ads_df["date"] = pd.to_datetime(ads_df["date"])
+            daily_sales = orders_df.groupby("date")["amount"].sum().reset_index()
+            daily_spend = ads_df.groupby("date")["spend"].sum().reset_index()
+            return pd.merge(daily_sales, daily_spend, on="date", how="outer").fillna(0).sort_values("date")
+
+        _, merge_s = timed(groupby_merge)
+        results["raw_fetch"] = {"seconds": round(fetch_orders_s + fetch_ads_s, 4), "rows": len(orders_df) + len(ads_df)}
+        results["groupby_merge"] = {"seconds": merge_s}
+    finally:
+        db.shutdown()
+        shop.shutdown()
+    return results
+
+
+def bench_backfill(size):
+    """Bulk-operation backfill streamed from a local JSONL fixture."""
+    from supabase import create_client
+    import backfill_shopify
+
+    db, fixture = fakes.postgrest(), fakes.jsonl_fixture(size)
+    backfill_shopify.CHECKPOINT_DIR = tempfile.mkdtemp(prefix="growifyx-backfill-")
+    try:
+        stats, seconds = timed(backfill_shopify.backfill, SHOP_URL, "token", create_client(db.url, FAKE_KEY),
+                               jsonl_url=f"{fixture.url}/orders.jsonl")
+        if not stats["ok"] or stats["rows_written"] != size:
+            raise RuntimeError(f"backfill: expected {size} rows, got {stats}")
+        return {"backfill": {"seconds": seconds, "rows": stats["rows_written"],
+                             "rows_per_sec": round(stats["rows_written"] / seconds, 1)}}
+    finally:
+        db.shutdown()
+        fixture.shutdown()
+
+
+def bench_meta_ingest(latency):
+    """fetch_ads over a short (paged) and a long (async report run) date range."""
+    from datetime import date, timedelta
+    from supabase import create_client
+    import ingest_meta
+
+    ingest_meta.POLL_INTERVAL = 0.05
+    db, graph = fakes.postgrest(), fakes.graph(latency, n_ads=N_ADS)
+    results = {}
+    try:
+        supabase = create_client(db.url, FAKE_KEY)
+        until = date(2024, 6, 30)
+        for label, days in (("meta_ingest_sync", 7), ("meta_ingest_async", 90)):
+            since = (until - timedelta(days=days - 1)).isoformat()
+            stats, seconds = timed(ingest_meta.fetch_ads, SHOP_URL, "token", "act_1", supabase,
+                                   since=since, until=until.isoformat(), graph_url=graph.url)
+            if not stats["ok"] or stats["rows_written"] != days * N_ADS:
+                raise RuntimeError(f"{label}: expected {days * N_ADS} rows, got {stats}")
+            results[label] = {"seconds": seconds, "rows": stats["rows_written"], "pages": len(stats["pages"])}
+    finally:
+        db.shutdown()
+        graph.shutdown()
+    return results
+
+
+def bench_ai(latency):
+    """Analysis stream + five concurrent drafts, cold (LLM) and warm (disk cache)."""
+    gemini = fakes.gemini(latency)
+    os.environ["GEMINI_API_KEY"] = "bench"
+    os.environ["GEMINI_API_ENDPOINT"] = gemini.url
+    import llm_cache
+    llm_cache.CACHE_PATH = os.path.join(tempfile.mkdtemp(prefix="growifyx-llm-"), "cache.sqlite3")
+    from ai_strategist import ANALYSIS_MODEL, ANALYSIS_SYSTEM_PROMPT, InsightResponse, generate_ad_draft, generate_email_draft
+
+    def analysis():
+        started, ttft = time.perf_counter(), None
+        for text in llm_cache.stream_json(ANALYSIS_MODEL, ANALYSIS_SYSTEM_PROMPT, "bench data", InsightResponse, 0.2):
+            ttft = ttft if ttft is not None else time.perf_counter() - started
+        return InsightResponse.model_validate_json(text), round(ttft, 4)
+
+    def drafts(insights):
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(generate_email_draft, r.target_entity, r.rationale) if r.action_type == "draft_email"
+                       else pool.submit(generate_ad_draft, r.action_type, r.target_entity, r.rationale)
+                       for r in insights.recommendations]
+            return [f.result() for f in futures]
+
+    results = {}
+    try:
+        for label in ("cold", "warm"):
+            (insights, ttft), seconds = timed(analysis)
+            results[f"ai_analysis_{label}"] = {"seconds": seconds, "ttft": ttft}
+            _, seconds = timed(drafts, insights)
+            results[f"ai_drafts_{label}"] = {"seconds": seconds, "drafts": len(insights.recommendations)}
+        results["ai_cache"] = dict(llm_cache.stats)
+    finally:
+        gemini.shutdown()
+    return results
+
+
+def bench_deploy(latency):
+    """First deploy (creates campaign + ad set) vs. follow-up deploys that reuse them."""
+    import meta_deploy
+    graph = fakes.graph(latency)
+    try:
+        deployer = meta_deploy.MetaDeployer("token", "act_1", "page_1", graph_url=graph.url)
+        results = {}
+        for label in ("deploy_first", "deploy_reuse"):
+            (_, timings), seconds = timed(deployer.deploy, "Headline", "Primary text", "SHOP_NOW", f"{graph.url}/image.jpg")
+            results[label] = {"seconds": seconds, **timings}
+    finally:
+        graph.shutdown()
+    return results
+
+
+def compare(old, new):
+    print(f"{'benchmark':<36}{'old s':>10}{'new s':>10}{'ratio':>8}")
+    for name, result in new["results"].items():
+        before = old["results"].get(name, {}).get("seconds")
+        if before and "seconds" in result:
+            print(f"{name:<36}{before:>10.4f}{result['seconds']:>10.4f}{result['seconds'] / before:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GrowifyX offline benchmarks")
+    parser.add_argument("--sizes", default="1000,100000,1000000", help="comma-separated order counts")
+    parser.add_argument("--gemini-latency", type=float, default=0.5, help="seconds per fake Gemini call")
+    parser.add_argument("--graph-latency", type=float, default=0.1, help="seconds per fake Graph API call")
+    parser.add_argument("--shopify-leak", type=float, default=1000.0,
+                        help="fake bucket leak rate (calls/sec); 2.0 reproduces Shopify's real limit")
+    parser.add_argument("--out", help="write JSON results here (default: stdout)")
+    parser.add_argument("--compare", help="earlier JSON results to compare against")
+    args = parser.parse_args()
+
+    commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    report = {"commit": commit, "created_at": datetime.now(timezone.utc).isoformat(),
+              "python": platform.python_version(), "results": {}}
+
+    for size in [int(s) for s in args.sizes.split(",") if s]:
+        print(f"⏱️ Data path @ {size:,} orders...", file=sys.stderr)
+        for name, result in {**bench_data(size, args.shopify_leak), **bench_backfill(size)}.items():
+            report["results"][f"{name}@{size}"] = result
+    print("⏱️ AI flow...", file=sys.stderr)
+    report["results"].update(bench_ai(args.gemini_latency))
+    print("⏱️ Meta deploy...", file=sys.stderr)
+    report["results"].update(bench_deploy(args.graph_latency))
+    print("⏱️ Meta insights ingest...", file=sys.stderr)
+    report["results"].update(bench_meta_ingest(args.graph_latency))
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
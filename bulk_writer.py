@@ -0,0 +1,128 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+
+# Shared high-throughput write path for Supabase.
+#
+# Rows are streamed (any iterable works, so callers never hold a whole dataset as dicts),
+# cut into chunks bounded by row count and estimated payload size, de-duplicated by primary
+# key within each chunk (last version wins), and sent concurrently over the process's pooled
+# client with minimal returns. At most `max_workers` chunks are in flight at once.
+# Transient failures (network, 5xx, Postgres serialization/deadlock) are retried with backoff.
+
+CHUNK_ROWS = 500
+CHUNK_BYTES = 1_000_000  # Stay well under PostgREST / proxy request-size limits
+MAX_WORKERS = 4
+MAX_RETRIES = 4
+
+# Postgres SQLSTATE classes worth retrying: 08 connection, 40 serialization failure/deadlock,
+# 53 insufficient resources, 57 operator intervention (e.g. restart). PGRST* and the rest are permanent.
+TRANSIENT_SQLSTATES = ("08", "40", "53", "57")
+
+
+def dedupe(rows, key):
+    """Keeps the last row per primary key, preserving first-seen order."""
+    unique = {}
+    for row in rows:
+        unique[tuple(row[k] for k in key)] = row
+    return list(unique.values())
+
+
+def chunk(rows, max_rows=CHUNK_ROWS, max_bytes=CHUNK_BYTES):
+    """
+    Lazily splits an iterable of rows into lists of at most `max_rows` rows and ~`max_bytes`
+    of JSON. The size is estimated from each chunk's first row rather than encoding every row.
+    """
+    current, limit = [], max_rows
+    for row in rows:
+        if not current:
+            limit = max(1, min(max_rows, max_bytes // (len(json.dumps(row, default=str)) + 1)))
+        current.append(row)
+        if len(current) >= limit:
+            yield current
+            current = []
+    if current:
+        yield current
+
+
+def _is_transient(error):
+    """Network errors, HTTP 429/5xx and the retryable SQLSTATE classes."""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    try:
+        import httpx
+        if isinstance(error, httpx.TransportError):
+            return True
+    except ImportError:
+        pass
+    code = str(getattr(error, "code", "") or "")
+    if code.isdigit() and len(code) == 3:  # postgrest-py reports non-JSON errors by HTTP status
+        return code == "429" or code.startswith("5")
+    return len(code) == 5 and code.startswith(TRANSIENT_SQLSTATES)
+
+
+def _send(supabase_client, rows, table, rpc):
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            if rpc:
+                supabase_client.rpc(rpc, {"p_rows": rows}).execute()
+            else:
+                supabase_client.table(table).upsert(rows, returning="minimal").execute()
+            return len(rows)
+        except Exception as e:
+            if attempt == MAX_RETRIES or not _is_transient(e):
+                raise
+            time.sleep(0.5 * 2 ** attempt + random.uniform(0, 0.25))
+
+
+def write(supabase_client, rows, key, table=None, rpc=None, max_rows=CHUNK_ROWS, max_bytes=CHUNK_BYTES,
+          max_workers=MAX_WORKERS):
+    """
+    Upserts an iterable of `rows` into `table` (or through the `rpc` that takes {"p_rows": [...]}).
+
+    Duplicates are only collapsed within a chunk; pass rows already unique by `key` if they may
+    repeat far apart. Returns {"rows", "duplicates", "chunks", "seconds", "rows_per_sec"}.
+    Raises the first error that survives the retries (no new chunks are started after it).
+    """
+    started = time.perf_counter()
+    stats = {"rows": 0, "duplicates": 0, "chunks": 0}
+    slots = threading.BoundedSemaphore(max_workers)
+    futures = []
+
+    def send(batch):
+        try:
+            return _send(supabase_client, batch, table, rpc)
+        finally:
+            slots.release()
+
+    with metrics.span(f"write.{rpc or table}"), ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for batch in chunk(rows, max_rows, max_bytes):
+            unique = dedupe(batch, key)
+            stats["duplicates"] += len(batch) - len(unique)
+            stats["chunks"] += 1
+            slots.acquire()  # Back-pressure: the producer waits while max_workers chunks are in flight
+            futures.append(pool.submit(send, unique))
+            # Collect finished chunks as we go so errors surface early
+            for future in [f for f in futures if f.done()]:
+                futures.remove(future)
+                stats["rows"] += future.result()
+        for future in futures:
+            stats["rows"] += future.result()
+
+    seconds = time.perf_counter() - started
+    stats["seconds"] = round(seconds, 3)
+    stats["rows_per_sec"] = round(stats["rows"] / seconds, 1) if seconds > 0 else None
+    return stats
+
+
+def write_orders(supabase_client, rows, **kwargs):
+    """`shopify_orders` rows, keeping the daily_metrics rollup in sync."""
+    return write(supabase_client, rows, key=("order_id",), rpc="upsert_orders_with_rollup", **kwargs)
+
+
+def write_ads(supabase_client, rows, **kwargs):
+    """`facebook_ads` rows, keeping the daily_metrics rollup in sync."""
+    return write(supabase_client, rows, key=("ad_id", "date"), rpc="upsert_ads_with_rollup", **kwargs)
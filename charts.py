@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+# Chart data for the dashboard's "Sales vs. Ad Spend" panel.
+#
+# The selected date range is bucketed by day, week or month depending on its length, then
+# downsampled with LTTB (Largest-Triangle-Three-Buckets) to at most POINT_BUDGET points,
+# so the payload sent to the browser stays the same size however much history a shop has.
+
+POINT_BUDGET = 400
+SERIES = {"amount": ("Sales", "#00CC96"), "spend": ("Ad Spend", "#EF553B")}
+# (max days in range, pandas resample rule, label)
+RESOLUTIONS = [(730, "D", "daily"), (5 * 365, "W", "weekly"), (None, "MS", "monthly")]
+
+
+def resolution(start, end):
+    """The (rule, label) to bucket a date range by."""
+    days = (pd.Timestamp(end) - pd.Timestamp(start)).days + 1
+    for max_days, rule, label in RESOLUTIONS:
+        if max_days is None or days <= max_days:
+            return rule, label
+
+
+def lttb(y, n_out):
+    """Indices of the `n_out` points of `y` that best preserve its visual shape (evenly spaced x)."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)  # n_out - 2 buckets between the fixed ends
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[hi:next_hi].mean(), y[hi:next_hi].mean()
+        # Twice the triangle area between the last kept point, each candidate and the next bucket's average
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def chart_frame(daily_df, start, end, budget=POINT_BUDGET):
+    """
+    Sales and spend for [start, end], resampled to the range's resolution and downsampled
+    to `budget` points in total. Returns (frame indexed by date, resolution label).
+    """
+    rule, label = resolution(start, end)
+    df = daily_df[(daily_df["date"] >= pd.Timestamp(start)) & (daily_df["date"] <= pd.Timestamp(end))]
+    df = df.set_index("date")[list(SERIES)].resample(rule).sum()
+    if len(df) > budget:
+        # Each series keeps its own peaks; the union stays within the budget
+        keep = np.unique(np.concatenate([lttb(df[column].to_numpy(), budget // len(SERIES)) for column in SERIES]))
+        df = df.iloc[keep]
+    return df, label
+
+
+def sales_vs_spend(df):
+    """Plotly line chart of a `chart_frame` result."""
+    import plotly.graph_objects as go
+    fig = go.Figure([go.Scatter(x=df.index, y=df[column], name=name, mode="lines", line={"color": color})
+                     for column, (name, color) in SERIES.items()])
+    fig.update_layout(margin={"l": 0, "r": 0, "t": 10, "b": 0}, height=360, hovermode="x unified",
+                      legend={"orientation": "h", "y": 1.1})
+    return fig
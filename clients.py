@@ -0,0 +1,51 @@
+import os
+from functools import lru_cache
+
+# Process-wide config and API clients, created on first use.
+# Heavy SDKs (supabase, google.generativeai) are only imported when something needs them,
+# so the login page doesn't pay for the Gemini import or a Supabase handshake.
+
+SECRETS_FILE = "secrets.txt"
+
+
+@lru_cache(maxsize=None)
+def load_config():
+    """Reads secrets.txt into the environment once per process."""
+    from dotenv import load_dotenv
+    load_dotenv(SECRETS_FILE)
+    return {
+        "SUPABASE_URL": os.getenv("SUPABASE_URL"),
+        "SUPABASE_KEY": os.getenv("SERVICE_ROLE_KEY"),
+        "GEMINI_API_KEY": os.getenv("GEMINI_API_KEY"),
+        "GEMINI_API_ENDPOINT": os.getenv("GEMINI_API_ENDPOINT", ""),  # e.g. a local stand-in for benchmarks
+        # Meta API Keys (Leave blank for Demo Mode)
+        "META_TOKEN": os.getenv("META_ACCESS_TOKEN", ""),
+        "META_AD_ACCOUNT": os.getenv("META_AD_ACCOUNT_ID", ""),
+        "META_PAGE": os.getenv("META_PAGE_ID", ""),
+        # Shops that see the latency panel, and the first local Prometheus /metrics port (one per worker process)
+        "ADMIN_SHOPS": [s.strip() for s in os.getenv("GROWIFYX_ADMIN_SHOPS", "").split(",") if s.strip()],
+        "METRICS_PORT": int(os.getenv("GROWIFYX_METRICS_PORT", "9108")),
+        # Default for the sidebar's "Rules-only analysis" toggle (skip Gemini for the analysis)
+        "RULES_ONLY": os.getenv("GROWIFYX_RULES_ONLY", "").lower() in ("1", "true", "yes"),
+    }
+
+
+@lru_cache(maxsize=None)
+def get_supabase():
+    """One Supabase client (and so one pooled HTTP connection set) per process."""
+    from supabase import create_client
+    config = load_config()
+    return create_client(config["SUPABASE_URL"], config["SUPABASE_KEY"])
+
+
+@lru_cache(maxsize=None)
+def get_genai():
+    """Imports and configures the Gemini SDK the first time an AI call needs it."""
+    import google.generativeai as genai
+    config = load_config()
+    if config["GEMINI_API_ENDPOINT"]:
+        genai.configure(api_key=config["GEMINI_API_KEY"], transport="rest",
+                        client_options={"api_endpoint": config["GEMINI_API_ENDPOINT"]})
+    else:
+        genai.configure(api_key=config["GEMINI_API_KEY"])
+    return genai
@@ -0,0 +1,178 @@
+import json
+import time
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+import bulk_writer
+from meta_deploy import META_GRAPH_URL, TIMEOUT, make_session
+
+# Loads ad-level daily insights from the Meta Marketing API into `facebook_ads`.
+# Mirrors ingest_shopify.fetch_orders: stream pages, upsert in bounded chunks, return stats.
+
+INSIGHT_FIELDS = "ad_id,spend,clicks,impressions,actions"
+PURCHASE_ACTIONS = {"purchase", "omni_purchase", "offsite_conversion.fb_pixel_purchase"}
+UPSERT_CHUNK_SIZE = 500
+PAGE_LIMIT = 500
+ASYNC_THRESHOLD_DAYS = 14   # Longer ranges go through an async report run
+POLL_INTERVAL = 2
+POLL_TIMEOUT = 600
+REFETCH_DAYS = 3            # Meta keeps revising recent days as attribution settles
+DEFAULT_LOOKBACK_DAYS = 90
+MAX_WORKERS = 4
+
+
+def format_insight(row, shop_url, ad_account_id):
+    """Maps one ad/day insights row into a `facebook_ads` row."""
+    purchases = sum(int(float(a.get("value", 0))) for a in row.get("actions", []) if a.get("action_type") in PURCHASE_ACTIONS)
+    return {
+        "ad_id": str(row["ad_id"]),
+        "shop_url": shop_url,
+        "ad_account_id": ad_account_id,
+        "date": row["date_start"],
+        "spend": float(row.get("spend", 0)),
+        "clicks": int(row.get("clicks", 0)),
+        "impressions": int(row.get("impressions", 0)),
+        "purchases": purchases,
+    }
+
+
+def _parse(response):
+    """The JSON body, or an HTTPError for Graph API errors and non-JSON failures (e.g. a proxy 502)."""
+    try:
+        payload = response.json()
+    except ValueError:
+        response.raise_for_status()
+        raise requests.HTTPError(f"Non-JSON response from Meta ({response.status_code})", response=response)
+    if isinstance(payload, dict) and "error" in payload:
+        raise requests.HTTPError(payload["error"].get("message", payload["error"]), response=response)
+    response.raise_for_status()
+    return payload
+
+
+def _get(http, url, params):
+    return _parse(http.get(url, params=params, timeout=TIMEOUT))
+
+
+def _run_async_report(http, graph_url, ad_account_id, params):
+    """Starts an insights report run and waits for it; returns the report_run_id."""
+    payload = _parse(http.post(f"{graph_url}/{ad_account_id}/insights", data=params, timeout=TIMEOUT))
+    report_id = payload["report_run_id"]
+
+    deadline = time.monotonic() + POLL_TIMEOUT
+    while time.monotonic() < deadline:
+        status = _get(http, f"{graph_url}/{report_id}",
+                      {"access_token": params["access_token"], "fields": "async_status,async_percent_completion"})
+        if status["async_status"] == "Job Completed":
+            return report_id
+        if status["async_status"] in ("Job Failed", "Job Skipped"):
+            raise requests.HTTPError(f"Insights report {report_id}: {status['async_status']}")
+        time.sleep(POLL_INTERVAL)
+    raise TimeoutError(f"Insights report {report_id} did not finish in {POLL_TIMEOUT}s")
+
+
+def iter_insight_pages(shop_url, access_token, ad_account_id, since, until, session=None, graph_url=META_GRAPH_URL):
+    """
+    Generator yielding (formatted_rows, page_stats) for ad-level daily insights,
+    following `paging.cursors.after`. Date ranges over ASYNC_THRESHOLD_DAYS use an async report run.
+    """
+    http = session or make_session()
+    params = {
+        "access_token": access_token,
+        "level": "ad",
+        "time_increment": 1,
+        "fields": INSIGHT_FIELDS,
+        "time_range": json.dumps({"since": since, "until": until}),
+        "limit": PAGE_LIMIT,
+    }
+
+    if (date.fromisoformat(until) - date.fromisoformat(since)).days > ASYNC_THRESHOLD_DAYS:
+        report_id = _run_async_report(http, graph_url, ad_account_id, params)
+        url, params = f"{graph_url}/{report_id}/insights", {"access_token": access_token, "limit": PAGE_LIMIT}
+    else:
+        url = f"{graph_url}/{ad_account_id}/insights"
+
+    page = 0
+    while True:
+        started = time.perf_counter()
+        payload = _get(http, url, params)
+        rows = payload.get("data", [])
+        elapsed = time.perf_counter() - started
+        page += 1
+
+        yield [format_insight(r, shop_url, ad_account_id) for r in rows], {
+            "page": page,
+            "rows": len(rows),
+            "seconds": round(elapsed, 3),
+            "rows_per_sec": round(len(rows) / elapsed, 1) if elapsed > 0 else None,
+        }
+
+        after = payload.get("paging", {}).get("cursors", {}).get("after")
+        if not rows or not after or "next" not in payload.get("paging", {}):
+            return
+        params = {**params, "after": after}
+
+
+def _watermark(supabase_client, shop_url, ad_account_id):
+    """Latest ad date already stored for the shop's ad account (None on its first sync)."""
+    rows = supabase_client.table("facebook_ads").select("date").eq("shop_url", shop_url) \
+        .eq("ad_account_id", ad_account_id).order("date", desc=True).limit(1).execute().data
+    return rows[0]["date"] if rows else None
+
+
+def fetch_ads(shop_url, access_token, ad_account_id, supabase_client, chunk_size=UPSERT_CHUNK_SIZE,
+              since=None, until=None, graph_url=META_GRAPH_URL, session=None):
+    """
+    Fetches ad insights for ONE ad account and saves them to Supabase, page by page.
+    Without `since`, resumes REFETCH_DAYS before the account's latest stored ad date.
+
+    Returns a stats dict: {"ok", "rows_written", "pages", "seconds", "error", "since", "until"}.
+    """
+    if not since:
+        last = _watermark(supabase_client, shop_url, ad_account_id)
+        start = date.fromisoformat(last) - timedelta(days=REFETCH_DAYS) if last else date.today() - timedelta(days=DEFAULT_LOOKBACK_DAYS)
+        since = start.isoformat()
+    until = until or date.today().isoformat()
+
+    print(f"⏳ Fetching Meta insights for {ad_account_id} ({since} → {until})...")
+    started = time.perf_counter()
+    stats = {"ok": True, "rows_written": 0, "pages": [], "seconds": 0.0, "error": None, "since": since, "until": until}
+
+    try:
+        pages = iter_insight_pages(shop_url, access_token, ad_account_id, since, until, session=session, graph_url=graph_url)
+        for rows, page_stats in pages:
+            # Upserts the ads and bumps daily_metrics by each chunk's delta (schema.sql)
+            stats["rows_written"] += bulk_writer.write_ads(supabase_client, rows, max_rows=chunk_size)["rows"]
+            stats["pages"].append(page_stats)
+            print(f"   Page {page_stats['page']}: {page_stats['rows']} rows ({page_stats['rows_per_sec']} rows/s)")
+    except requests.HTTPError as e:
+        print(f"❌ Error fetching from Meta: {e}")
+        stats.update(ok=False, error=str(e))
+    except Exception as e:
+        print(f"   ⚠️ Database Error: {e}")
+        stats.update(ok=False, error=str(e))
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    if stats["ok"]:
+        print(f"✅ Saved {stats['rows_written']} ad rows in {stats['seconds']}s!")
+    return stats
+
+
+def fetch_ads_for_accounts(shop_url, access_token, ad_account_ids, supabase_client, max_workers=MAX_WORKERS, **kwargs):
+    """Runs `fetch_ads` for several ad accounts concurrently. Returns {ad_account_id: stats}."""
+    session = make_session(pool_size=max_workers)
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(fetch_ads, shop_url, access_token, account, supabase_client, session=session, **kwargs): account
+                   for account in ad_account_ids}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    return results
+
+
+if __name__ == "__main__":
+    import os
+    import clients
+    config = clients.load_config()
+    accounts = [a.strip() for a in config["META_AD_ACCOUNT"].split(",") if a.strip()]
+    fetch_ads_for_accounts(os.getenv("SEED_SHOP_URL", "5h1azi-yh.myshopify.com"), config["META_TOKEN"],
+                           accounts, clients.get_supabase(), graph_url=os.getenv("META_GRAPH_URL", META_GRAPH_URL))
@@ -1,52 +1,134 @@
 import requests
-from supabase import create_client
-import os
+import time
+import bulk_writer
+import metrics
 
 # We don't load .env here anymore because we get keys dynamically!
 
-def fetch_orders(shop_url, access_token, supabase_client):
+API_VERSION = "2024-01"
+PAGE_LIMIT = 250  # Shopify's max page size for orders.json
+ORDER_FIELDS = "id,created_at,updated_at,total_price,currency,email"
+UPSERT_CHUNK_SIZE = 500
+
+# Shopify's REST leaky bucket: 40 calls per store, leaking 2/sec
+BUCKET_LEAK_PER_SEC = 2.0
+BUCKET_HEADROOM = 4
+MAX_RETRIES = 5
+
+
+def _next_page_url(response):
+    """Returns the rel="next" URL from Shopify's Link header (or None on the last page)."""
+    return response.links.get("next", {}).get("url")
+
+
+def _respect_call_limit(response):
+    """Sleeps just long enough to keep this store's bucket below capacity."""
+    used, _, size = response.headers.get("X-Shopify-Shop-Api-Call-Limit", "0/40").partition("/")
+    try:
+        overflow = int(used) - (int(size) - BUCKET_HEADROOM)
+    except ValueError:
+        return
+    if overflow > 0:
+        time.sleep(overflow / BUCKET_LEAK_PER_SEC)
+
+
+def _get_with_rate_limit(http, url, headers, params):
+    """GET that honours 429 Retry-After and the per-store call-limit header."""
+    for attempt in range(MAX_RETRIES + 1):
+        response = http.get(url, headers=headers, params=params, timeout=30)
+        if response.status_code == 429 and attempt < MAX_RETRIES:
+            time.sleep(float(response.headers.get("Retry-After", 2.0)))
+            continue
+        response.raise_for_status()
+        _respect_call_limit(response)
+        return response
+
+
+def format_order(order, shop_url):
+    """Maps one Shopify order into a `shopify_orders` row."""
+    return {
+        "order_id": str(order["id"]),
+        "shop_url": shop_url,  # IMPORTANT: We tag the data with the shop name!
+        "date": order["created_at"].split("T")[0],
+        "amount": float(order["total_price"]),
+        "currency": order["currency"],
+        "customer_email": order.get("email") or "Unknown"
+    }
+
+
+def iter_order_pages(shop_url, access_token, session=None, updated_at_min=None, base_url=None):
     """
-    Fetches orders for a SPECIFIC shop and saves them to Supabase.
+    Generator that follows Shopify's page_info cursors and yields
+    (formatted_rows, page_stats) one page at a time.
+
+    `updated_at_min` limits the pull to orders changed since the last sync;
+    `base_url` points at a different host (e.g. a local fake Shopify).
     """
-    print(f"⏳ Fetching orders for {shop_url}...")
-    
-    # 1. API Request to Shopify
-    url = f"https://{shop_url}/admin/api/2024-01/orders.json?status=any"
+    http = session or requests.Session()
+    url = f"{base_url or 'https://' + shop_url}/admin/api/{API_VERSION}/orders.json"
+    params = {"status": "any", "limit": PAGE_LIMIT, "fields": ORDER_FIELDS}
+    if updated_at_min:
+        params["updated_at_min"] = updated_at_min
     headers = {
         "X-Shopify-Access-Token": access_token,
         "Content-Type": "application/json"
     }
-    
-    response = requests.get(url, headers=headers)
-    
-    if response.status_code != 200:
-        print(f"❌ Error fetching from Shopify: {response.text}")
-        return False
-
-    data = response.json()
-    orders = data.get("orders", [])
-    print(f"✅ Found {len(orders)} orders!")
-
-    # 2. Save to Supabase (Tagging them with shop_url)
-    formatted_orders = []
-    for order in orders:
-        formatted_orders.append({
-            "order_id": str(order["id"]),
-            "shop_url": shop_url,  # IMPORTANT: We tag the data with the shop name!
-            "date": order["created_at"].split("T")[0],
-            "amount": float(order["total_price"]),
-            "currency": order["currency"],
-            "customer_email": order.get("email", "Unknown")
-        })
-        
-    if formatted_orders:
-        try:
-            # Upsert (Insert or Update)
-            supabase_client.table("shopify_orders").upsert(formatted_orders).execute()
-            print("   Saved to Database!")
-            return True
-        except Exception as e:
-            print(f"   ⚠️ Database Error: {e}")
-            return False
-    
-    return True
\ No newline at end of file
+
+    page = 0
+    while url:
+        started = time.perf_counter()
+        response = _get_with_rate_limit(http, url, headers, params)
+
+        orders = response.json().get("orders", [])
+        elapsed = time.perf_counter() - started
+        metrics.observe("shopify.page", elapsed)
+        page += 1
+
+        yield [format_order(o, shop_url) for o in orders], {
+            "page": page,
+            "orders": len(orders),
+            "seconds": round(elapsed, 3),
+            "orders_per_sec": round(len(orders) / elapsed, 1) if elapsed > 0 else None,
+            "max_updated_at": max((o["updated_at"] for o in orders if o.get("updated_at")), default=None),
+        }
+
+        # page_info URLs already carry limit/fields, and Shopify rejects extra filters on them
+        url = _next_page_url(response)
+        params = None
+
+
+def fetch_orders(shop_url, access_token, supabase_client, chunk_size=UPSERT_CHUNK_SIZE,
+                 updated_at_min=None, base_url=None):
+    """
+    Fetches orders for a SPECIFIC shop and saves them to Supabase, page by page.
+
+    Returns a stats dict: {"ok", "rows_written", "pages": [per-page stats], "seconds", "error",
+    "max_updated_at"} — the last one is the new sync watermark.
+    """
+    print(f"⏳ Fetching orders for {shop_url}...")
+    started = time.perf_counter()
+    stats = {"ok": True, "rows_written": 0, "pages": [], "seconds": 0.0, "error": None,
+             "max_updated_at": updated_at_min}
+
+    try:
+        # 1. Stream pages from Shopify, 2. upsert each page in bounded chunks
+        pages = iter_order_pages(shop_url, access_token, updated_at_min=updated_at_min, base_url=base_url)
+        for rows, page_stats in pages:
+            # Upserts the orders and bumps daily_metrics by each chunk's delta (schema.sql)
+            stats["rows_written"] += bulk_writer.write_orders(supabase_client, rows, max_rows=chunk_size)["rows"]
+            stats["pages"].append(page_stats)
+            # ISO-8601 timestamps from one store share an offset, so string max is safe
+            if page_stats["max_updated_at"]:
+                stats["max_updated_at"] = max(filter(None, [stats["max_updated_at"], page_stats["max_updated_at"]]))
+            print(f"   Page {page_stats['page']}: {page_stats['orders']} orders ({page_stats['orders_per_sec']} orders/s)")
+    except requests.HTTPError as e:
+        print(f"❌ Error fetching from Shopify: {e.response.text}")
+        stats.update(ok=False, error=str(e))
+    except Exception as e:
+        print(f"   ⚠️ Database Error: {e}")
+        stats.update(ok=False, error=str(e))
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    if stats["ok"]:
+        print(f"✅ Saved {stats['rows_written']} orders in {stats['seconds']}s!")
+    return stats
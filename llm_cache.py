@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from clients import get_genai
+import metrics
+
+# Disk-backed cache for Gemini JSON responses, shared by every Streamlit process and
+# surviving restarts. Identical (model, system prompt, user prompt, schema, temperature)
+# calls return the stored text instead of paying LLM latency again.
+
+CACHE_PATH = os.getenv("GROWIFYX_LLM_CACHE", os.path.join(".cache", "llm_cache.sqlite3"))
+TTL_SECONDS = int(os.getenv("GROWIFYX_LLM_CACHE_TTL", str(7 * 24 * 3600)))
+MAX_ENTRIES = int(os.getenv("GROWIFYX_LLM_CACHE_MAX_ENTRIES", "5000"))
+
+stats = {"hits": 0, "misses": 0}
+
+_models = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def _db():
+    """One SQLite connection per thread; WAL mode lets processes read while one writes."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(CACHE_PATH) or ".", exist_ok=True)
+        conn = sqlite3.connect(CACHE_PATH, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        _local.conn = conn
+    return conn
+
+
+def get_model(model_name, system_prompt):
+    """Reuses one GenerativeModel per (model, system prompt) instead of building one per call."""
+    key = (model_name, system_prompt)
+    with _lock:
+        if key not in _models:
+            _models[key] = get_genai().GenerativeModel(model_name, system_instruction=system_prompt)
+        return _models[key]
+
+
+def cache_key(model_name, system_prompt, user_prompt, response_schema, temperature):
+    schema = json.dumps(response_schema.model_json_schema(), sort_keys=True)
+    raw = json.dumps([model_name, system_prompt, user_prompt, schema, temperature])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def lookup(key):
+    """Returns the cached text for `key`, or None if missing/expired."""
+    now = time.time()
+    conn = _db()
+    row = conn.execute("SELECT text, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+    if row is None or now - row[1] > TTL_SECONDS:
+        return None
+    with conn:
+        conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+    return row[0]
+
+
+def store(key, text):
+    """Saves a response and trims expired / least-recently-used entries past MAX_ENTRIES."""
+    now = time.time()
+    conn = _db()
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, text, now, now))
+        conn.execute("DELETE FROM responses WHERE created_at < ?", (now - TTL_SECONDS,))
+        conn.execute("""
+            DELETE FROM responses WHERE key IN (
+                SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )""", (MAX_ENTRIES,))
+
+
+def generate_json(model_name, system_prompt, user_prompt, response_schema, temperature):
+    """Cached `generate_content` call returning the raw JSON text of a structured response."""
+    key = cache_key(model_name, system_prompt, user_prompt, response_schema, temperature)
+    text = lookup(key)
+    with _lock:
+        stats["hits" if text is not None else "misses"] += 1
+    if text is not None:
+        return text
+
+    model = get_model(model_name, system_prompt)
+    with metrics.span("gemini.generate"):
+        res = model.generate_content(user_prompt, generation_config=get_genai().GenerationConfig(
+            response_mime_type="application/json", response_schema=response_schema, temperature=temperature))
+    store(key, res.text)
+    return res.text
+
+
+def stream_json(model_name, system_prompt, user_prompt, response_schema, temperature):
+    """
+    Streaming variant of `generate_json`: yields the response text accumulated so far
+    after every chunk (a cache hit yields the full text once). The complete text is cached.
+    """
+    key = cache_key(model_name, system_prompt, user_prompt, response_schema, temperature)
+    text = lookup(key)
+    with _lock:
+        stats["hits" if text is not None else "misses"] += 1
+    if text is not None:
+        yield text
+        return
+
+    model = get_model(model_name, system_prompt)
+    started = time.perf_counter()
+    res = model.generate_content(user_prompt, stream=True, generation_config=get_genai().GenerationConfig(
+        response_mime_type="application/json", response_schema=response_schema, temperature=temperature))
+    text = ""
+    for chunk in res:
+        if not text:
+            metrics.observe("gemini.stream.first_token", time.perf_counter() - started)
+        text += chunk.text
+        yield text
+    metrics.observe("gemini.stream", time.perf_counter() - started)
+    store(key, text)
@@ -0,0 +1,147 @@
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import queries
+
+# Persistent per-shop Parquet cache for dashboard data.
+#
+# Layout: CACHE_DIR/<shop>/<table>.parquet, each file carrying its own `updated_at`
+# watermark in the Parquet metadata. Files are replaced atomically (unique temp file + rename)
+# and eviction tolerates files vanishing under it, so several Streamlit worker processes can
+# share one cache directory safely.
+
+CACHE_DIR = os.getenv("GROWIFYX_CACHE_DIR", os.path.join(".cache", "growifyx"))
+MAX_CACHE_BYTES = int(os.getenv("GROWIFYX_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+# Re-read a small window before the watermark so rows committed slightly late aren't missed
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+TABLES = {
+    "shopify_orders": {"key": ("order_id",), "columns": "order_id,date,amount,currency,customer_email,updated_at"},
+    "facebook_ads": {"key": ("ad_id", "date"), "columns": "ad_id,date,spend,clicks,impressions,purchases,updated_at"},
+    "daily_metrics": {"key": ("date",), "columns": "date,sales,orders,spend,clicks,impressions,updated_at"},
+}
+
+
+def _shop_dir(shop_url):
+    return os.path.join(CACHE_DIR, re.sub(r"[^A-Za-z0-9._-]", "_", shop_url))
+
+
+def _read(path):
+    """Memory-mapped read; returns (DataFrame, watermark) or (None, None) if missing/corrupt."""
+    try:
+        table = pq.read_table(path, memory_map=True)
+    except (FileNotFoundError, pa.ArrowInvalid):
+        return None, None
+    watermark = (table.schema.metadata or {}).get(b"watermark", b"").decode() or None
+    try:
+        os.utime(path)  # Marks the shop as recently used for LRU eviction
+    except FileNotFoundError:
+        pass  # Evicted by another process after we read it
+    return table.to_pandas(), watermark
+
+
+def _write(path, df, watermark, attempts=3):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"watermark": watermark.encode()})
+    for attempt in range(attempts):
+        # Another process may evict the shop directory mid-write; recreate it and try again
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pq.write_table(table, f)
+            os.replace(tmp, path)
+            return
+        except FileNotFoundError:
+            if attempt == attempts - 1:
+                raise
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+def _size_and_mtime(path):
+    """(size, mtime) for the shop directory's finished files, ignoring vanished and in-progress ones."""
+    size, mtime = 0, 0.0
+    try:
+        names = os.listdir(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return 0, 0.0
+    for name in names:
+        if name.endswith(".tmp"):
+            continue
+        try:
+            stat = os.stat(os.path.join(path, name))
+        except FileNotFoundError:
+            continue  # Replaced or evicted by another process
+        size, mtime = size + stat.st_size, max(mtime, stat.st_mtime)
+    return size, mtime
+
+
+def _evict(keep_dir):
+    """
+    Drops least-recently-used shops until the cache fits in MAX_CACHE_BYTES. Other
+    processes may be reading, writing or evicting at the same time, so missing files are skipped.
+    """
+    try:
+        names = os.listdir(CACHE_DIR)
+    except FileNotFoundError:
+        return
+    shops = []
+    for name in names:
+        path = os.path.join(CACHE_DIR, name)
+        size, mtime = _size_and_mtime(path)
+        if size:
+            shops.append((mtime, size, path))
+
+    total = sum(size for _, size, _ in shops)
+    for _, size, path in sorted(shops):
+        if total <= MAX_CACHE_BYTES:
+            break
+        if os.path.abspath(path) != os.path.abspath(keep_dir):
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+
+def load_table(supabase_client, shop_url, table):
+    """
+    Returns every cached row of `table` for the shop, first pulling only the rows
+    whose `updated_at` is newer than the local watermark. Returns a DataFrame.
+    """
+    spec = TABLES[table]
+    shop_dir = _shop_dir(shop_url)
+    os.makedirs(shop_dir, exist_ok=True)
+    path = os.path.join(shop_dir, f"{table}.parquet")
+
+    cached, watermark = _read(path)
+    since = None
+    if watermark:
+        since = (datetime.fromisoformat(watermark) - WATERMARK_OVERLAP).isoformat()
+
+    fresh = queries.fetch_rows(supabase_client, table, shop_url, key=spec["key"],
+                               columns=spec["columns"], updated_since=since)
+    if fresh.empty and cached is not None:
+        return cached
+
+    # Newer versions of a row replace the cached one
+    frames = [d for d in (cached, fresh) if d is not None and not d.empty]
+    if not frames:
+        return fresh
+    df = pd.concat(frames, ignore_index=True)
+    df = df.drop_duplicates(subset=list(spec["key"]), keep="last").reset_index(drop=True)
+
+    new_watermark = str(df["updated_at"].max()) if "updated_at" in df else datetime.now(timezone.utc).isoformat()
+    _write(path, df, new_watermark)
+    _evict(keep_dir=shop_dir)
+    return df
+
+
+def clear(shop_url=None):
+    """Removes one shop's cache, or the whole cache."""
+    shutil.rmtree(_shop_dir(shop_url) if shop_url else CACHE_DIR, ignore_errors=True)
@@ -0,0 +1,226 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import metrics
+
+# Background Meta (Facebook) Ads deployment.
+#
+# One pooled session per ad account, image hashes cached by content digest, a single
+# campaign + ad set reused across creatives, and the dependent creative/ad calls sent
+# as one Graph API batch. Deploys run on a worker pool; the UI polls `job_status`.
+
+META_GRAPH_URL = "https://graph.facebook.com/v18.0"
+TIMEOUT = (5, 30)  # (connect, read) seconds
+POST_RETRIES = 3     # Only for 429 responses, which Meta rejects before doing anything
+LANDING_URL = "https://your-d2c-brand.com"
+
+
+class MetaAPIError(Exception):
+    def __init__(self, message, partial=None):
+        super().__init__(message)
+        self.partial = partial or {}  # Batch ops that succeeded before the failure
+
+
+def make_session(pool_size=10):
+    """
+    requests.Session with keep-alive pooling. GETs retry on throttling/5xx and read errors;
+    POSTs create objects, so they only retry connection errors (nothing reached Meta).
+    Throttled POSTs are retried by `MetaDeployer._send` instead.
+    """
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503),
+                  allowed_methods=frozenset({"GET"}), respect_retry_after_header=True)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class MetaDeployer:
+    """Deploys ad creatives into one ad account, reusing everything it can between calls."""
+
+    def __init__(self, access_token, ad_account, page_id, graph_url=META_GRAPH_URL, session=None):
+        self.access_token = access_token
+        self.ad_account = ad_account
+        self.page_id = page_id
+        self.graph_url = graph_url.rstrip("/")
+        self.session = session or make_session()
+        self.campaign_id = None
+        self.adset_id = None
+        self._image_bytes = {}   # image_url -> downloaded bytes
+        self._image_hashes = {}  # sha256(image bytes) -> Meta image hash
+        self._lock = threading.Lock()
+
+    def _check(self, payload):
+        if isinstance(payload, dict) and "error" in payload:
+            raise MetaAPIError(payload["error"].get("message", payload["error"]))
+        return payload
+
+    def _send(self, url, data, files=None):
+        """POST that retries only when throttled (a 5xx or timeout may have created objects already)."""
+        for attempt in range(POST_RETRIES + 1):
+            response = self.session.post(url, data=data, files=files, timeout=TIMEOUT)
+            if response.status_code != 429 or attempt == POST_RETRIES:
+                return response
+            time.sleep(float(response.headers.get("Retry-After") or 2 ** attempt))
+
+    def _post(self, path, data=None, files=None):
+        response = self._send(f"{self.graph_url}/{path}", {**(data or {}), "access_token": self.access_token}, files)
+        return self._check(response.json())
+
+    def _batch(self, operations):
+        """
+        Runs Graph API batch operations; returns each named op's parsed body. A null item
+        means Meta never ran the op (e.g. a dependency failed), so it raises like an error.
+        """
+        response = self._send(self.graph_url, {
+            "access_token": self.access_token,
+            "batch": json.dumps(operations),
+            "include_headers": "false",
+        })
+        results = {}
+        for op, item in zip(operations, self._check(response.json())):
+            if item is None:
+                raise MetaAPIError(f"{op['name']} not executed", partial=results)
+            body = json.loads(item["body"]) if item.get("body") else {}
+            if item.get("code") != 200:
+                raise MetaAPIError(f"{op['name']}: {body.get('error', {}).get('message', body)}", partial=results)
+            results[op["name"]] = body
+        return results
+
+    def _op(self, name, edge, fields, referenced=False):
+        """
+        One batch operation. Meta drops the response of ops that later ops reference via
+        {result=...} unless asked not to, and we need those ids (campaign/ad set reuse).
+        """
+        body = {k: v if isinstance(v, str) else json.dumps(v) for k, v in fields.items()}
+        op = {"method": "POST", "name": name, "relative_url": f"{self.ad_account}/{edge}", "body": urlencode(body)}
+        if referenced:
+            op["omit_response_on_success"] = False
+        return op
+
+    def upload_image(self, image_url):
+        """Returns the Meta image hash, downloading/uploading only for unseen images."""
+        if image_url not in self._image_bytes:
+            response = self.session.get(image_url, timeout=TIMEOUT)
+            response.raise_for_status()
+            self._image_bytes[image_url] = response.content
+        img_bytes = self._image_bytes[image_url]
+
+        digest = hashlib.sha256(img_bytes).hexdigest()
+        if digest not in self._image_hashes:
+            res = self._post(f"{self.ad_account}/adimages", files={"filename": ("ad.jpg", img_bytes, "image/jpeg")})
+            self._image_hashes[digest] = next(iter(res["images"].values()))["hash"]
+        return self._image_hashes[digest]
+
+    def deploy(self, headline, primary_text, cta, image_url, on_step=None):
+        """
+        Creates a PAUSED ad for the creative. Returns (ad_id, timings) where timings
+        maps each step to its latency in seconds.
+        """
+        timings = {}
+        step = on_step or (lambda name: None)
+
+        with self._lock:
+            step("Uploading Image to Meta...")
+            started = time.perf_counter()
+            image_hash = self.upload_image(image_url)
+            timings["image"] = round(time.perf_counter() - started, 3)
+
+            ops = []
+            if not self.campaign_id:
+                ops.append(self._op("campaign", "campaigns", {
+                    "name": "GrowifyX AI Promo", "objective": "OUTCOME_SALES",
+                    "status": "PAUSED", "special_ad_categories": "[]"}, referenced=True))
+            if not self.adset_id:
+                targeting = {"geo_locations": {"countries": ["IN", "US"]}, "age_min": 18, "age_max": 65}
+                ops.append(self._op("adset", "adsets", {
+                    "name": "AI Broad Audience", "campaign_id": self.campaign_id or "{result=campaign:$.id}",
+                    "daily_budget": "100000", "billing_event": "IMPRESSIONS", "optimization_goal": "REACH",
+                    "targeting": targeting, "status": "PAUSED"}, referenced=True))
+
+            story_spec = {"page_id": self.page_id, "link_data": {
+                "image_hash": image_hash, "link": LANDING_URL, "message": primary_text,
+                "name": headline, "call_to_action": {"type": cta}}}
+            ops.append(self._op("creative", "adcreatives", {
+                "name": f"Creative - {headline[:20]}", "object_story_spec": story_spec, "status": "ACTIVE"}, referenced=True))
+            ops.append(self._op("ad", "ads", {
+                "name": "GrowifyX AI Drafted Ad", "adset_id": self.adset_id or "{result=adset:$.id}",
+                "creative": '{"creative_id":"{result=creative:$.id}"}', "status": "PAUSED"}))
+
+            step("Creating Campaign, Ad Set & Ad Creative...")
+            started = time.perf_counter()
+            results = {}
+            try:
+                results = self._batch(ops)
+            except MetaAPIError as e:
+                results = e.partial
+                raise
+            finally:
+                # Keep whatever campaign/ad set was created so a retry doesn't duplicate it
+                self.campaign_id = self.campaign_id or results.get("campaign", {}).get("id")
+                self.adset_id = self.adset_id or results.get("adset", {}).get("id")
+            timings["batch"] = round(time.perf_counter() - started, 3)
+            for name, seconds in timings.items():
+                metrics.observe(f"meta.{name}", seconds)
+            return results["ad"]["id"], timings
+
+
+# --- BACKGROUND JOBS ---
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="meta-deploy")
+_jobs = {}
+_deployers = {}
+_registry_lock = threading.Lock()
+
+
+def get_deployer(access_token, ad_account, page_id, graph_url=META_GRAPH_URL):
+    """One MetaDeployer (and so one pooled session + campaign) per ad account per process."""
+    key = (access_token, ad_account, page_id, graph_url)
+    with _registry_lock:
+        if key not in _deployers:
+            _deployers[key] = MetaDeployer(access_token, ad_account, page_id, graph_url)
+        return _deployers[key]
+
+
+def _run_demo(job):
+    # DEMO MODE: Simulate the API sequence for Loom videos
+    for message, seconds in [("Uploading Image to Meta...", 1.5), ("Creating Paused Campaign...", 1),
+                             ("Assembling Ad Creative...", 1), ("Creating Ad...", 1.5)]:
+        job["step"] = message
+        time.sleep(seconds)
+    return "DEMO_SUCCESS", {}
+
+
+def _run(job_id, deployer, args):
+    job = _jobs[job_id]
+    started = time.perf_counter()
+    try:
+        if deployer is None:
+            job["result"], job["timings"] = _run_demo(job)
+        else:
+            job["result"], job["timings"] = deployer.deploy(*args, on_step=lambda name: job.update(step=name))
+        job["status"] = "done"
+    except Exception as e:
+        job["result"] = f"ERROR: {e}"
+        job["status"] = "error"
+    job["timings"]["total"] = round(time.perf_counter() - started, 3)
+
+
+def submit(deployer, headline, primary_text, cta, image_url):
+    """Starts a deploy in the background and returns its job id. `deployer=None` runs demo mode."""
+    job_id = uuid.uuid4().hex
+    _jobs[job_id] = {"status": "running", "step": "Queued...", "result": None, "timings": {}}
+    _executor.submit(_run, job_id, deployer, (headline, primary_text, cta, image_url))
+    return job_id
+
+
+def job_status(job_id):
+    """Snapshot of a job: {"status": running|done|error, "step", "result", "timings"}."""
+    return dict(_jobs.get(job_id, {"status": "error", "step": None, "result": "ERROR: unknown job", "timings": {}}))
@@ -0,0 +1,105 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Lightweight timing spans for the hot paths.
+#
+# Every span feeds a process-wide histogram (exported in Prometheus text format from a
+# local /metrics endpoint) and, if the current thread is inside `begin_run()`, the
+# per-rerun breakdown shown in the dashboard's admin panel.
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Each worker process exports its own histograms, so process N binds the first free port in
+# [port, port + PORT_RANGE); point Prometheus at the whole range.
+PORT_RANGE = 16
+
+_histograms = {}  # span name -> {"buckets": [...], "sum": float, "count": int}
+_lock = threading.Lock()
+_local = threading.local()
+_server = None
+_FAILED = object()  # serve() found no free port; don't retry on every rerun
+
+
+def observe(name, seconds):
+    """Records one duration for `name`."""
+    with _lock:
+        hist = _histograms.setdefault(name, {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0})
+        i = bisect.bisect_left(BUCKETS, seconds)
+        if i < len(BUCKETS):
+            hist["buckets"][i] += 1
+        hist["sum"] += seconds
+        hist["count"] += 1
+    run = getattr(_local, "run", None)
+    if run is not None:
+        run.append((name, seconds))
+
+
+@contextmanager
+def span(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started)
+
+
+def begin_run():
+    """Starts collecting this thread's spans (one Streamlit rerun); returns the list they land in."""
+    _local.run = []
+    return _local.run
+
+
+def prometheus_text():
+    lines = ["# HELP growifyx_span_seconds Duration of instrumented hot-path spans.",
+             "# TYPE growifyx_span_seconds histogram"]
+    with _lock:
+        for name, hist in sorted(_histograms.items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS, hist["buckets"]):
+                cumulative += count
+                lines.append(f'growifyx_span_seconds_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'growifyx_span_seconds_bucket{{span="{name}",le="+Inf"}} {hist["count"]}')
+            lines.append(f'growifyx_span_seconds_sum{{span="{name}"}} {hist["sum"]:.6f}')
+            lines.append(f'growifyx_span_seconds_count{{span="{name}"}} {hist["count"]}')
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        data = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve(port=9108, host="127.0.0.1"):
+    """
+    Starts the /metrics endpoint once per process on the first free port from `port` up
+    (see PORT_RANGE). Later calls are no-ops. Returns the server, or None if every port was taken.
+    """
+    global _server
+    with _lock:
+        if _server is None:
+            for candidate in range(port, port + PORT_RANGE):
+                try:
+                    _server = ThreadingHTTPServer((host, candidate), MetricsHandler)
+                    break
+                except OSError:
+                    continue  # Owned by another worker process
+            else:
+                print(f"⚠️ No free metrics port in {port}-{port + PORT_RANGE - 1}; this process's spans won't be exported")
+                _server = _FAILED
+                return None
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return None if _server is _FAILED else _server
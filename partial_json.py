@@ -0,0 +1,45 @@
+import json
+
+# Best-effort parsing of a JSON document that is still being streamed, e.g.
+# '{"summary": "Sales are up", "recommendations": [{"action_ty' -> {"summary": "Sales are up", "recommendations": [{}]}
+
+
+def _close(text):
+    """Appends whatever quotes/brackets are needed to make a truncated document well-formed."""
+    stack = []
+    in_str = escaped = False
+    for ch in text:
+        if in_str:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_str = False
+        elif ch == '"':
+            in_str = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+
+    if in_str:
+        text = text[:-1] if escaped else text
+        text += '"'
+    if text.rstrip().endswith(":"):
+        text += "null"
+    return text + "".join(reversed(stack))
+
+
+def parse_partial(text):
+    """
+    Returns the largest parseable prefix of `text` as Python objects, or None.
+    Tries the whole text first, then backs off to earlier value boundaries.
+    """
+    cuts = {len(text)} | {i for i, ch in enumerate(text) if ch == ","} | {i + 1 for i, ch in enumerate(text) if ch in "{["}
+    for end in sorted(cuts, reverse=True):
+        try:
+            return json.loads(_close(text[:end]))
+        except ValueError:
+            continue
+    return None
@@ -0,0 +1,63 @@
+import pandas as pd
+
+# Read helpers for the dashboard. Everything here is scoped to one shop.
+
+PAGE_SIZE = 1000  # PostgREST's default max-rows cap
+
+
+DAILY_COLUMNS = ["date", "amount", "orders", "spend", "clicks", "impressions"]
+
+
+def to_daily_frame(rows):
+    """Shapes `daily_metrics` rows (list of dicts or DataFrame) into the dashboard's daily frame."""
+    df = pd.DataFrame(rows, columns=["date", "sales", "orders", "spend", "clicks", "impressions"])
+    df = df.rename(columns={"sales": "amount"})[DAILY_COLUMNS]
+    df["date"] = pd.to_datetime(df["date"])
+    return df.sort_values("date")
+
+
+def _after(query, key, last):
+    """Adds the keyset predicate "row comes after `last`" for a one- or two-column key."""
+    if len(key) == 1:
+        return query.gt(key[0], last[0])
+    (k1, k2), (v1, v2) = key, last
+    return query.or_(f'{k1}.gt."{v1}",and({k1}.eq."{v1}",{k2}.gt."{v2}")')
+
+
+def iter_rows(supabase_client, table, shop_url, key, columns="*", start=None, end=None,
+              updated_since=None, page_size=PAGE_SIZE):
+    """
+    Keyset-paginated read of raw rows (ordered by `key`), so we never hit the
+    PostgREST row cap or the cost of deep OFFSETs. Yields one page (list of dicts) at a time.
+
+    `key` is a column name or a tuple of two for composite keys like ("ad_id", "date");
+    `updated_since` only returns rows whose `updated_at` is newer.
+    """
+    key = (key,) if isinstance(key, str) else tuple(key)
+    last = None
+    while True:
+        query = supabase_client.table(table).select(columns).eq("shop_url", shop_url)
+        if start:
+            query = query.gte("date", start)
+        if end:
+            query = query.lte("date", end)
+        if updated_since:
+            query = query.gt("updated_at", updated_since)
+        if last is not None:
+            query = _after(query, key, last)
+        for k in key:
+            query = query.order(k)
+
+        rows = query.limit(page_size).execute().data
+        if not rows:
+            return
+        yield rows
+        if len(rows) < page_size:
+            return
+        last = tuple(rows[-1][k] for k in key)
+
+
+def fetch_rows(supabase_client, table, shop_url, key, columns="*", start=None, end=None, updated_since=None):
+    """Collects every page from `iter_rows` into a DataFrame."""
+    pages = iter_rows(supabase_client, table, shop_url, key, columns, start, end, updated_since)
+    return pd.DataFrame([row for page in pages for row in page])
@@ -0,0 +1,100 @@
+import pandas as pd
+import analytics
+from ai_strategist import InsightResponse, RecommendedAction
+
+# Deterministic fast path for the AI Strategist.
+#
+# Flags the obvious calls (ads burning money below breakeven, ads worth more budget) from the
+# analytics metrics in milliseconds, so the dashboard can show them before Gemini answers.
+# Gemini then only sharpens the rationale and adds what the rules can't see, or does the full
+# analysis when the rules find nothing.
+
+MIN_SPEND_7D = 1000      # ₹ spent over 7 days before an ad's numbers are trusted
+KILL_ROAS = 1.0          # Below breakeven
+SCALE_ROAS = 2.5
+SCALE_MIN_TREND = 0.9    # 7-day ROAS may be at most 10% under the 28-day ROAS to scale
+DECLINE_TREND = 0.7      # 7-day ROAS 30%+ under the 28-day ROAS counts as collapsing
+MAX_ACTIONS = 5
+
+
+def _money(value):
+    return f"₹{value:,.0f}"
+
+
+def _kill(ad_id, r):
+    if r.spend_7d < MIN_SPEND_7D or pd.isna(r.roas_7d):
+        return None
+    collapsing = pd.notna(r.roas_trend) and r.roas_trend < DECLINE_TREND and r.roas_7d < SCALE_ROAS
+    if r.roas_7d >= KILL_ROAS and not collapsing:
+        return None
+    confidence = 70 + (15 if r.roas_7d == 0 or collapsing else 0) + (10 if r.spend_7d >= 5 * MIN_SPEND_7D else 0)
+    trend = f", down from {r.roas_28d:.2f}x over 28 days" if collapsing else ""
+    return RecommendedAction(action_type="kill_ad", confidence_score=min(confidence, 95), target_entity=str(ad_id),
+                             rationale=f"ROAS {r.roas_7d:.2f}x on {_money(r.spend_7d)} spend in 7 days{trend}.")
+
+
+def _scale(ad_id, r):
+    if r.spend_7d < MIN_SPEND_7D or pd.isna(r.roas_7d) or r.roas_7d < SCALE_ROAS:
+        return None
+    if pd.notna(r.roas_trend) and r.roas_trend < SCALE_MIN_TREND:
+        return None
+    confidence = 65 + (15 if pd.notna(r.roas_trend) and r.roas_trend >= 1.1 else 0) + (10 if r.spend_7d >= 5 * MIN_SPEND_7D else 0)
+    return RecommendedAction(action_type="scale_ad", confidence_score=min(confidence, 95), target_entity=str(ad_id),
+                             rationale=f"ROAS {r.roas_7d:.2f}x on {_money(r.spend_7d)} spend in 7 days and holding up.")
+
+
+def evaluate(daily_df, ads_df):
+    """
+    Runs the rules over the shop's daily and per-ad frames.
+
+    Returns (InsightResponse, conclusive). `conclusive` is False when no rule fired, i.e.
+    the full Gemini analysis is needed.
+    """
+    if daily_df.empty:
+        return InsightResponse(summary="No sales or ad data synced yet.", primary_bottleneck="No data to analyse.",
+                               recommendations=[]), False
+    day = analytics.daily_metrics(daily_df)
+    ads = analytics.ad_metrics(ads_df, daily_df)
+    last_7d = day.tail(7)
+    sales, spend = last_7d["sales"].sum(), last_7d["spend"].sum()
+    roas_7d, roas_28d = day["roas_7d"].iloc[-1], day["roas_28d"].iloc[-1]
+
+    kills, scales = [], []
+    for ad_id, r in ads.iterrows():
+        if (action := _kill(ad_id, r)):
+            kills.append((r.spend_7d * (1 - min(r.roas_7d, 1)), action))  # Ranked by money lost
+        elif (action := _scale(ad_id, r)):
+            scales.append((r.roas_7d, action))
+    recommendations = [a for _, a in sorted(kills, key=lambda x: -x[0])] + [a for _, a in sorted(scales, key=lambda x: -x[0])]
+
+    dead_days = last_7d[(last_7d["spend"] > 0) & (last_7d["sales"] == 0)]
+    if not dead_days.empty:
+        bottleneck = (f"{_money(dead_days['spend'].sum())} of ad spend on {len(dead_days)} day(s) with zero sales "
+                      f"({', '.join(d.strftime('%b %d') for d in dead_days.index)}).")
+    elif kills:
+        bottleneck = f"{len(kills)} ad(s) spending below breakeven ROAS."
+    elif pd.notna(roas_7d) and roas_7d < KILL_ROAS:
+        bottleneck = f"Blended ROAS is {roas_7d:.2f}x, below breakeven."
+    else:
+        bottleneck = "No rule-based bottleneck found."
+
+    roas_text = f"ROAS {roas_7d:.2f}x vs {roas_28d:.2f}x over 28 days" if pd.notna(roas_7d) and pd.notna(roas_28d) else "no ROAS yet"
+    summary = (f"Last 7 days: {_money(sales)} sales on {_money(spend)} ad spend ({roas_text}). "
+               f"Rules flagged {len(kills)} ad(s) to pause and {len(scales)} to scale.")
+
+    insights = InsightResponse(summary=summary, primary_bottleneck=bottleneck, recommendations=recommendations[:MAX_ACTIONS])
+    return insights, bool(recommendations)
+
+
+def merge(rule_insights, llm_insights):
+    """
+    Gemini's summary and bottleneck with the rule actions kept first (taking Gemini's
+    rationale where it returned the same action), followed by anything Gemini added.
+    """
+    llm_recs = {(r.action_type, r.target_entity): r for r in llm_insights.recommendations}
+    recommendations = []
+    for rec in rule_insights.recommendations:
+        enriched = llm_recs.pop((rec.action_type, rec.target_entity), None)
+        recommendations.append(rec.model_copy(update={"rationale": enriched.rationale}) if enriched else rec)
+    recommendations += list(llm_recs.values())
+    return llm_insights.model_copy(update={"recommendations": recommendations})
@@ -0,0 +1,158 @@
+-- GrowifyX Supabase schema changes. Run in the Supabase SQL editor.
+
+-- Per-shop sync watermark used by sync_shops.py
+alter table shops add column if not exists orders_updated_at_min timestamptz;
+alter table shops drop column if exists last_order_id;  -- Never read; updated_at alone is the watermark
+
+-- Shop-scoped reads: every dashboard query filters by shop and a date window
+alter table facebook_ads add column if not exists shop_url text;
+create index if not exists shopify_orders_shop_date_idx on shopify_orders (shop_url, date);
+create index if not exists facebook_ads_shop_date_idx on facebook_ads (shop_url, date);
+
+-- Superseded by the daily_metrics rollup below
+drop function if exists daily_sales_vs_spend(text, date, date);
+
+-- Daily rollup maintained at ingest time, one row per (shop_url, date).
+-- The dashboard reads this instead of grouping raw orders/ads.
+create table if not exists daily_metrics (
+  shop_url text not null,
+  date date not null,
+  sales float8 not null default 0,
+  orders integer not null default 0,
+  spend float8 not null default 0,
+  clicks bigint not null default 0,
+  impressions bigint not null default 0,
+  updated_at timestamptz not null default now(),
+  primary key (shop_url, date)
+);
+
+-- Row change timestamps: local_cache.py refreshes only rows newer than its watermark
+alter table shopify_orders add column if not exists updated_at timestamptz not null default now();
+alter table facebook_ads add column if not exists updated_at timestamptz not null default now();
+create index if not exists shopify_orders_shop_updated_idx on shopify_orders (shop_url, updated_at);
+create index if not exists facebook_ads_shop_updated_idx on facebook_ads (shop_url, updated_at);
+create index if not exists daily_metrics_shop_updated_idx on daily_metrics (shop_url, updated_at);
+
+-- One insights row per ad per day (purchases come from ingest_meta.py)
+alter table facebook_ads add column if not exists purchases integer not null default 0;
+-- Each ad account resumes from its own latest date (ingest_meta._watermark)
+alter table facebook_ads add column if not exists ad_account_id text;
+create index if not exists facebook_ads_shop_account_date_idx on facebook_ads (shop_url, ad_account_id, date);
+-- The key is (ad_id, date): replace the old primary key (whatever it was named) so a
+-- single-column ad_id key can't reject a second day of the same ad. Safe to re-run.
+do $$
+declare
+  pk text;
+begin
+  select c.conname into pk from pg_constraint c
+  where c.conrelid = 'facebook_ads'::regclass and c.contype = 'p';
+  if pk is not null and pk <> 'facebook_ads_pkey_ad_date' then
+    execute format('alter table facebook_ads drop constraint %I', pk);
+  end if;
+  if pk is null or pk <> 'facebook_ads_pkey_ad_date' then
+    alter table facebook_ads add constraint facebook_ads_pkey_ad_date primary key (ad_id, date);
+  end if;
+end;
+$$;
+drop index if exists facebook_ads_ad_date_idx;  -- Superseded by the primary key
+
+-- Upserts a batch of orders and applies only the batch's delta to daily_metrics.
+-- Re-upserted/edited orders first subtract their previous (date, amount), so the
+-- rollup stays exact even when an order's total or date changes.
+create or replace function upsert_orders_with_rollup(p_rows jsonb)
+returns integer
+language plpgsql as $$
+declare
+  n integer;
+  k text;
+begin
+  -- Serialise concurrent batches touching the same orders, including orders neither has
+  -- inserted yet (a row lock can't cover those). Sorted, so two batches can't deadlock.
+  for k in select distinct r->>'order_id' from jsonb_array_elements(p_rows) r order by 1 loop
+    perform pg_advisory_xact_lock(hashtext('shopify_orders:' || k));
+  end loop;
+
+  with incoming as (
+    select distinct on (order_id) *
+    from jsonb_to_recordset(p_rows) as r(order_id text, shop_url text, date date, amount float8, currency text, customer_email text)
+  ), deltas as (
+    select o.shop_url, o.date, -o.amount as amount, -1 as n
+    from shopify_orders o join incoming i on i.order_id = o.order_id
+    union all
+    select i.shop_url, i.date, i.amount, 1 from incoming i
+  )
+  insert into daily_metrics (shop_url, date, sales, orders)
+  select shop_url, date, sum(amount), sum(n) from deltas group by shop_url, date
+  order by shop_url, date  -- Same row-lock order in every batch
+  on conflict (shop_url, date) do update
+    set sales = daily_metrics.sales + excluded.sales,
+        orders = daily_metrics.orders + excluded.orders,
+        updated_at = now();
+
+  insert into shopify_orders (order_id, shop_url, date, amount, currency, customer_email)
+  select distinct on (order_id) order_id, shop_url, date, amount, currency, customer_email
+  from jsonb_to_recordset(p_rows) as r(order_id text, shop_url text, date date, amount float8, currency text, customer_email text)
+  on conflict (order_id) do update
+    set shop_url = excluded.shop_url, date = excluded.date, amount = excluded.amount,
+        currency = excluded.currency, customer_email = excluded.customer_email,
+        updated_at = now();
+  get diagnostics n = row_count;
+  return n;
+end;
+$$;
+
+-- Same as above for ad insights rows, keyed by (ad_id, date).
+create or replace function upsert_ads_with_rollup(p_rows jsonb)
+returns integer
+language plpgsql as $$
+declare
+  n integer;
+  k text;
+begin
+  for k in select distinct (r->>'ad_id') || '|' || (r->>'date') from jsonb_array_elements(p_rows) r order by 1 loop
+    perform pg_advisory_xact_lock(hashtext('facebook_ads:' || k));
+  end loop;
+
+  with incoming as (
+    select distinct on (ad_id, date) *
+    from jsonb_to_recordset(p_rows) as r(ad_id text, shop_url text, date date, spend float8, clicks bigint, impressions bigint)
+  ), deltas as (
+    select a.shop_url, a.date, -a.spend as spend, -a.clicks as clicks, -a.impressions as impressions
+    from facebook_ads a join incoming i on i.ad_id = a.ad_id and i.date = a.date
+    union all
+    select i.shop_url, i.date, i.spend, i.clicks, i.impressions from incoming i
+  )
+  insert into daily_metrics (shop_url, date, spend, clicks, impressions)
+  select shop_url, date, sum(spend), sum(clicks), sum(impressions) from deltas group by shop_url, date
+  order by shop_url, date
+  on conflict (shop_url, date) do update
+    set spend = daily_metrics.spend + excluded.spend,
+        clicks = daily_metrics.clicks + excluded.clicks,
+        impressions = daily_metrics.impressions + excluded.impressions,
+        updated_at = now();
+
+  insert into facebook_ads (ad_id, shop_url, ad_account_id, date, spend, clicks, impressions, purchases)
+  select distinct on (ad_id, date) ad_id, shop_url, ad_account_id, date, spend, clicks, impressions, coalesce(purchases, 0)
+  from jsonb_to_recordset(p_rows)
+    as r(ad_id text, shop_url text, ad_account_id text, date date, spend float8, clicks bigint, impressions bigint, purchases integer)
+  on conflict (ad_id, date) do update
+    set shop_url = excluded.shop_url, ad_account_id = coalesce(excluded.ad_account_id, facebook_ads.ad_account_id),
+        spend = excluded.spend,
+        clicks = excluded.clicks, impressions = excluded.impressions, purchases = excluded.purchases,
+        updated_at = now();
+  get diagnostics n = row_count;
+  return n;
+end;
+$$;
+
+-- One-off backfill of daily_metrics from rows ingested before the rollup existed
+insert into daily_metrics (shop_url, date, sales, orders, spend, clicks, impressions)
+select shop_url, date, sum(sales), sum(orders), sum(spend), sum(clicks), sum(impressions) from (
+  select shop_url, date, sum(amount) as sales, count(*) as orders, 0 as spend, 0 as clicks, 0 as impressions
+  from shopify_orders where shop_url is not null group by shop_url, date
+  union all
+  select shop_url, date, 0, 0, sum(spend), sum(clicks), sum(impressions)
+  from facebook_ads where shop_url is not null group by shop_url, date
+) t
+group by shop_url, date
+on conflict (shop_url, date) do nothing;
@@ -1,56 +1,127 @@
+import argparse
 import os
-import random
-import uuid
-from datetime import datetime, timedelta
-from supabase import create_client, Client
-from dotenv import load_dotenv
-
-# 1. Load Secrets
-load_dotenv("secrets.txt")
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SERVICE_ROLE_KEY") # Use Service Role to write freely
-
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-def generate_fake_data():
-    print("🌱 Seeding Database with 30 days of Fake Data...")
-    
-    orders = []
-    ads = []
-    
-    # Loop back 30 days
-    today = datetime.now()
-    for i in range(30):
-        date = (today - timedelta(days=i)).strftime("%Y-%m-%d")
-        
-        # --- Fake Shopify Orders (Randomly 0 to 5 orders per day) ---
-        daily_orders_count = random.randint(0, 5)
-        for _ in range(daily_orders_count):
-            orders.append({
-                "order_id": str(uuid.uuid4()),
-                "date": date,
-                "amount": round(random.uniform(500, 5000), 2), # Sales between ₹500 and ₹5000
-                "currency": "INR",
-                "customer_email": f"user{random.randint(1,100)}@gmail.com"
-            })
-            
-        # --- Fake Facebook Ads (One entry per day) ---
-        ads.append({
-            "ad_id": str(uuid.uuid4()),
-            "date": date,
-            "spend": round(random.uniform(1000, 8000), 2), # Spend between ₹1000 and ₹8000
-            "clicks": random.randint(50, 500),
-            "impressions": random.randint(1000, 10000)
-        })
-
-    # 2. Upload to Supabase
-    print(f"📤 Uploading {len(orders)} Orders...")
-    supabase.table("shopify_orders").upsert(orders).execute()
-    
-    print(f"📤 Uploading {len(ads)} Ad Records...")
-    supabase.table("facebook_ads").upsert(ads).execute()
-    
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+import bulk_writer
+
+# Synthetic Shopify orders + Meta ad rows for demos and load testing.
+#
+#   python seed_data.py                                   # 30 days of demo data for SEED_SHOP_URL
+#   python seed_data.py --orders 5000000 --shops 50 --ads 20 --days 730 --out parquet
+#
+# Everything is generated with NumPy per shop (no Python loops per row), deterministic for a
+# given --seed, and written in bounded chunks: concurrent upserts to Supabase or Parquet/CSV files.
+
+SHOP_URL = os.getenv("SEED_SHOP_URL", "5h1azi-yh.myshopify.com")  # Shop the demo data belongs to
+CHUNK_SIZE = 5000
+MAX_WORKERS = 4
+
+
+def seasonality(days, rng):
+    """Relative daily demand: weekly cycle (weekend peak), yearly wave, mild growth, noise."""
+    t = np.arange(len(days))
+    weekday = np.array([d.weekday() for d in days])
+    weekly = np.where(weekday >= 5, 1.3, 1.0)
+    yearly = 1 + 0.25 * np.sin(2 * np.pi * (t - 300) / 365.25)  # Festive-season bump
+    trend = 1 + 0.5 * t / max(len(days), 1)
+    return weekly * yearly * trend * rng.lognormal(0, 0.15, len(days))
+
+
+def shop_frames(shop_url, shop_idx, orders_per_shop, n_ads, days, seed):
+    """Returns (orders_df, ads_df) for one shop."""
+    rng = np.random.default_rng([seed, shop_idx])
+    demand = seasonality(days, rng)
+    counts = rng.poisson(orders_per_shop * demand / demand.sum())
+    day_strings = np.array([d.isoformat() for d in days])
+
+    n = int(counts.sum())
+    orders = pd.DataFrame({
+        "order_id": f"seed-{shop_idx}-" + pd.Series(np.arange(n)).astype(str),
+        "shop_url": shop_url,
+        "date": np.repeat(day_strings, counts),
+        "amount": np.round(np.clip(rng.lognormal(np.log(1800), 0.6, n), 199, 25000), 2),
+        "currency": "INR",
+        "customer_email": "user" + pd.Series(rng.integers(1, max(n // 3, 100), n)).astype(str) + "@gmail.com",
+    })
+
+    # One row per ad per day; spend follows demand, each ad has its own efficiency
+    ad_ids = np.array([f"seed-{shop_idx}-ad{a}" for a in range(n_ads)])
+    ad_weight = rng.dirichlet(np.ones(n_ads))
+    spend = np.outer(demand / demand.mean(), ad_weight) * rng.uniform(1000, 8000) * rng.lognormal(0, 0.2, (len(days), n_ads))
+    ctr = rng.uniform(0.005, 0.03, n_ads)
+    cpm = rng.uniform(80, 250, n_ads)
+    impressions = (spend / cpm * 1000).astype(np.int64)
+    # Meta-attributed purchases: a share of each day's orders, split by spend x the ad's efficiency
+    efficiency = rng.lognormal(0, 0.6, n_ads)
+    share = spend * efficiency
+    share /= share.sum(axis=1, keepdims=True)
+    purchases = rng.poisson(rng.binomial(counts, 0.6)[:, None] * share)
+    ads = pd.DataFrame({
+        "ad_id": np.tile(ad_ids, len(days)),
+        "shop_url": shop_url,
+        "date": np.repeat(day_strings, n_ads),
+        "spend": np.round(spend.ravel(), 2),
+        "clicks": rng.binomial(impressions, np.tile(ctr, (len(days), 1))).ravel(),
+        "impressions": impressions.ravel(),
+        "purchases": purchases.ravel(),
+    })
+    return orders, ads
+
+
+def iter_shops(n_orders, n_shops, n_ads, n_days, seed):
+    """Yields (shop_url, orders_df, ads_df) one shop at a time to keep memory flat."""
+    today = date.today()
+    days = [today - timedelta(days=i) for i in range(n_days - 1, -1, -1)]
+    for shop_idx in range(n_shops):
+        shop_url = SHOP_URL if n_shops == 1 else f"seed-shop-{shop_idx}.myshopify.com"
+        yield (shop_url, *shop_frames(shop_url, shop_idx, n_orders / n_shops, n_ads, days, seed))
+
+
+def _records(df, size):
+    """Row dicts, converted one chunk at a time so a shop's frame never exists twice in memory."""
+    for i in range(0, len(df), size):
+        yield from df.iloc[i:i + size].to_dict("records")
+
+
+def upload(supabase_client, frames, chunk_size=CHUNK_SIZE, max_workers=MAX_WORKERS):
+    """Concurrent chunked upserts through the rollup RPCs (which also keep daily_metrics in sync)."""
+    for shop_url, orders, ads in frames:
+        print(f"📤 {shop_url}: {len(orders):,} orders, {len(ads):,} ad rows...")
+        for write, df in ((bulk_writer.write_orders, orders), (bulk_writer.write_ads, ads)):
+            result = write(supabase_client, _records(df, chunk_size), max_rows=chunk_size, max_workers=max_workers)
+            print(f"   {result['rows']:,} rows in {result['seconds']}s ({result['rows_per_sec']:,} rows/s)")
+
+
+def export(frames, out_dir, fmt):
+    """Writes one file per shop and table for bulk loading (e.g. Postgres COPY)."""
+    os.makedirs(out_dir, exist_ok=True)
+    for shop_idx, (shop_url, orders, ads) in enumerate(frames):
+        for table, df in (("shopify_orders", orders), ("facebook_ads", ads)):
+            path = os.path.join(out_dir, f"{table}-{shop_idx:04d}.{fmt}")
+            df.to_parquet(path, index=False) if fmt == "parquet" else df.to_csv(path, index=False)
+        print(f"💾 {shop_url}: {len(orders):,} orders, {len(ads):,} ad rows")
+
+
+def generate_fake_data(n_orders=75, n_shops=1, n_ads=1, n_days=30, seed=42, out=None, out_dir="seed_output"):
+    print(f"🌱 Generating {n_orders:,} orders across {n_shops} shop(s), {n_ads} ad(s), {n_days} days...")
+    frames = iter_shops(n_orders, n_shops, n_ads, n_days, seed)
+    if out:
+        export(frames, out_dir, out)
+    else:
+        from clients import get_supabase
+        upload(get_supabase(), frames)
     print("✅ Done! Your database is now full of data.")
 
+
 if __name__ == "__main__":
-    generate_fake_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate synthetic GrowifyX data")
+    parser.add_argument("--orders", type=int, default=75, help="total orders across all shops")
+    parser.add_argument("--shops", type=int, default=1)
+    parser.add_argument("--ads", type=int, default=1, help="ads per shop")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", choices=["parquet", "csv"], help="write files instead of uploading")
+    parser.add_argument("--out-dir", default="seed_output")
+    args = parser.parse_args()
+    generate_fake_data(args.orders, args.shops, args.ads, args.days, args.seed, args.out, args.out_dir)
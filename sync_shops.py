@@ -0,0 +1,70 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import ingest_shopify
+
+# Standalone incremental sync runner: `python sync_shops.py`
+# Every shop in the `shops` table is re-synced from its own high-water mark
+# (orders_updated_at_min), several shops at a time.
+
+MAX_WORKERS = 8
+
+
+def load_shops(supabase_client):
+    """Reads every registered shop together with its sync watermark."""
+    response = supabase_client.table("shops").select(
+        "shop_url,access_token,orders_updated_at_min"
+    ).execute()
+    return response.data
+
+
+def sync_shop(shop, supabase_client, base_url=None):
+    """Pulls only orders changed since the shop's watermark, then advances it."""
+    stats = ingest_shopify.fetch_orders(
+        shop["shop_url"],
+        shop["access_token"],
+        supabase_client,
+        updated_at_min=shop.get("orders_updated_at_min"),
+        base_url=base_url,
+    )
+
+    # Only move the watermark forward after a clean run, so a failed sync is retried in full
+    if stats["ok"] and stats["max_updated_at"]:
+        supabase_client.table("shops").update({"orders_updated_at_min": stats["max_updated_at"]}) \
+            .eq("shop_url", shop["shop_url"]).execute()
+    return stats
+
+
+def sync_all(supabase_client, max_workers=MAX_WORKERS, base_url=None):
+    """
+    Syncs every shop on a worker pool. Each worker owns one shop at a time, so
+    Shopify's per-store leaky bucket is respected inside `ingest_shopify`.
+
+    Returns {shop_url: stats}.
+    """
+    shops = load_shops(supabase_client)
+    print(f"🔄 Syncing {len(shops)} shops with {max_workers} workers...")
+    started = time.perf_counter()
+    results = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(sync_shop, shop, supabase_client, base_url): shop["shop_url"] for shop in shops}
+        for future in as_completed(futures):
+            shop_url = futures[future]
+            try:
+                results[shop_url] = future.result()
+            except Exception as e:
+                results[shop_url] = {"ok": False, "rows_written": 0, "error": str(e)}
+
+    failed = [url for url, stats in results.items() if not stats["ok"]]
+    total = sum(stats["rows_written"] for stats in results.values())
+    print(f"✅ Synced {total} orders across {len(results)} shops in {time.perf_counter() - started:.1f}s")
+    if failed:
+        print(f"⚠️ Failed shops: {', '.join(failed)}")
+    return results
+
+
+if __name__ == "__main__":
+    import clients
+    clients.load_config()
+    sync_all(clients.get_supabase(), base_url=os.getenv("SHOPIFY_BASE_URL"))
@@ -0,0 +1,199 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import bulk_writer
+import ingest_shopify
+import metrics
+
+# Shopify webhook receiver: `python webhooks.py`
+#
+# Accepts orders/create and orders/updated, verifies the HMAC, and acknowledges right away.
+# Orders are coalesced in memory (latest version per order wins) and written to
+# `shopify_orders` in batches when the buffer is big enough or old enough, so Shopify's
+# 5-second deadline never depends on database latency. Orders still unsaved at shutdown
+# are spooled to disk and picked up again on the next start.
+
+TOPICS = {"orders/create", "orders/updated"}
+FLUSH_MAX_ROWS = 500
+FLUSH_MAX_SECONDS = 2.0
+STOP_RETRIES = 4
+SPOOL_PATH = os.path.join(".cache", "webhooks", "pending.json")
+
+
+def verify_hmac(body, signature, secret):
+    """Checks X-Shopify-Hmac-Sha256 (base64 HMAC-SHA256 of the raw body)."""
+    digest = base64.b64encode(hmac.new(secret.encode(), body, hashlib.sha256).digest()).decode()
+    return hmac.compare_digest(digest, signature or "")
+
+
+def _save_spool(rows, path=SPOOL_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(list(rows.values()), f)
+    os.replace(f"{path}.tmp", path)
+
+
+def _load_spool(path=SPOOL_PATH):
+    """{order_id: (updated_at, row)} saved by a previous shutdown, or {}."""
+    try:
+        with open(path) as f:
+            return {row["order_id"]: (updated_at, row) for updated_at, row in json.load(f)}
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+class OrderBuffer:
+    """Coalesces incoming orders by order_id and flushes them in batched upserts."""
+
+    def __init__(self, supabase_client, max_rows=FLUSH_MAX_ROWS, max_seconds=FLUSH_MAX_SECONDS):
+        self.supabase = supabase_client
+        self.max_rows = max_rows
+        self.max_seconds = max_seconds
+        self._rows = {}  # order_id -> (updated_at, row)
+        self._oldest = None
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._spooled = False  # Rows reloaded from SPOOL_PATH that haven't been saved yet
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        pending = _load_spool()
+        if pending:
+            print(f"↩️ Reloaded {len(pending)} webhook orders left over from the last shutdown")
+            self._restore(pending)
+            self._spooled = True
+        self._thread.start()
+        return self
+
+    def add(self, order, shop_url):
+        row = ingest_shopify.format_order(order, shop_url)
+        updated_at = order.get("updated_at") or ""
+        with self._cond:
+            current = self._rows.get(row["order_id"])
+            # Webhooks can arrive out of order; never let an older version replace a newer one
+            if current is None or updated_at >= current[0]:
+                self._rows[row["order_id"]] = (updated_at, row)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+                self._cond.notify()  # Starts the flusher's max_seconds timer
+            elif len(self._rows) >= self.max_rows:
+                self._cond.notify()
+
+    def _take(self):
+        rows, self._rows, self._oldest = self._rows, {}, None
+        return rows
+
+    def _restore(self, rows):
+        """Puts a failed batch back without clobbering newer versions that arrived meanwhile."""
+        with self._cond:
+            for order_id, item in rows.items():
+                if order_id not in self._rows or item[0] > self._rows[order_id][0]:
+                    self._rows[order_id] = item
+            self._oldest = self._oldest or time.monotonic()
+
+    def flush(self):
+        with self._cond:
+            rows = self._take()
+        if not rows:
+            return 0
+        batch = [row for _, row in rows.values()]
+        try:
+            with metrics.span("webhooks.flush"):
+                result = bulk_writer.write_orders(self.supabase, batch, max_rows=self.max_rows)
+        except Exception as e:
+            print(f"   ⚠️ Database Error, will retry: {e}")
+            self._restore(rows)
+            return 0
+        print(f"   Saved {len(batch)} webhook orders ({result['rows_per_sec']} rows/s)")
+        if self._spooled:  # The first successful flush includes every reloaded row
+            self._spooled = False
+            try:
+                os.remove(SPOOL_PATH)
+            except FileNotFoundError:
+                pass
+        return len(batch)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    age = time.monotonic() - self._oldest if self._oldest else 0
+                    if len(self._rows) >= self.max_rows or (self._oldest and age >= self.max_seconds):
+                        break
+                    self._cond.wait(timeout=self.max_seconds - age if self._oldest else None)
+                stopped = self._stopped
+            if stopped:
+                return self._drain()
+            self.flush()
+            if self._rows:
+                time.sleep(0.5)  # Back off after a failed flush instead of spinning
+
+    def _drain(self):
+        """Final flush on stop, retried with backoff; whatever still fails is spooled to disk."""
+        for attempt in range(STOP_RETRIES):
+            self.flush()
+            if not self._rows:
+                return
+            time.sleep(0.5 * 2 ** attempt)
+        with self._cond:
+            rows = self._take()
+        _save_spool(rows)
+        self._spooled = False  # The spool now holds exactly these rows
+        print(f"   ⚠️ Spooled {len(rows)} unsaved webhook orders to {SPOOL_PATH}; they're retried on the next start")
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join()
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not verify_hmac(body, self.headers.get("X-Shopify-Hmac-Sha256"), self.server.secret):
+            return self._reply(401)
+
+        topic = self.headers.get("X-Shopify-Topic")
+        if topic in TOPICS:
+            try:
+                self.server.buffer.add(json.loads(body), self.headers.get("X-Shopify-Shop-Domain"))
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                # Authentic but unusable: a 4xx would only make Shopify retry it and eventually drop the webhook
+                print(f"   ⚠️ Skipping malformed {topic} webhook from {self.headers.get('X-Shopify-Shop-Domain')}: {e!r}")
+        self._reply(200)  # Acknowledge immediately; the DB write happens on the flusher thread
+
+
+def make_server(supabase_client, secret, port=8080, host="0.0.0.0", **buffer_options):
+    server = ThreadingHTTPServer((host, port), WebhookHandler)
+    server.secret = secret
+    server.buffer = OrderBuffer(supabase_client, **buffer_options).start()
+    return server
+
+
+if __name__ == "__main__":
+    import clients
+    clients.load_config()
+    if not os.getenv("SHOPIFY_WEBHOOK_SECRET"):
+        raise SystemExit("❌ Set SHOPIFY_WEBHOOK_SECRET (your app's API secret) in secrets.txt")
+    server = make_server(clients.get_supabase(), os.getenv("SHOPIFY_WEBHOOK_SECRET"),
+                         port=int(os.getenv("WEBHOOK_PORT", "8080")))
+    print(f"👂 Listening for Shopify webhooks on :{server.server_address[1]}...")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.buffer.stop()  # Flushes whatever is still buffered
+        print("Done.")